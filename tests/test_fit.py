@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from trident.model.fit import fit_preset
+from trident.model.fit import read_observed
+from trident.model.fit import Singlet
+from trident.model.transform import transform_spectrum
+
+
+MULTIPLIER = 9.07
+SHIFTS = [-30.5, 0, 2.8]
+COEFFICIENTS = [1 / 9, 3 / 9, 5 / 9]
+
+
+def singlet():
+    vv = np.linspace(-5, 5, 2001)
+    return vv, np.exp(-vv ** 2) + 0.2
+
+
+def write_observed(file_path, x, y):
+    with open(file_path, "w") as file:
+        file.write("VV FullAbs ResPart Thermal\n")
+        for x_value, y_value in zip(x, y):
+            file.write(f"{x_value:.17e} {y_value:.17e} 0 0\n")
+
+
+@pytest.mark.parametrize("baseline", [0.0, 1.0, -3.0])
+def test_fit_recovers_preset_with_baseline(tmp_path, baseline):
+    vv, f = singlet()
+    spectrum = transform_spectrum(vv, f, MULTIPLIER, SHIFTS, COEFFICIENTS)
+    file_path = tmp_path / "observed.dat"
+    write_observed(file_path, spectrum.grid, spectrum.total + baseline)
+
+    x, y = read_observed(str(file_path))
+    multiplier, shifts, coefficients, rms = fit_preset(
+        vv, f, x, y, 9.0, [-30, 0.5, 3])
+
+    assert multiplier == pytest.approx(MULTIPLIER, abs=1e-8)
+    assert shifts == pytest.approx(SHIFTS, abs=1e-8)
+    assert coefficients == pytest.approx(COEFFICIENTS, abs=1e-8)
+    assert rms < 1e-10
+
+
+def test_singlet_with_duplicate_vv():
+    vv = np.array([0.0, 1.0, 1.0, 2.0])
+    f = np.array([0.0, 1.0, 3.0, 0.0])
+    with np.errstate(all="raise"):
+        singlet = Singlet(vv, f)
+    values, slopes = singlet.evaluate(np.array([0.5, 1.5]))
+    assert np.isfinite(values).all()
+    assert np.isfinite(slopes).all()
@@ -0,0 +1,71 @@
+import copy
+
+import numpy as np
+import pytest
+
+from trident.model.model import Model
+
+
+def test_edit_preset_copies_built_in_preset():
+    model = Model()
+    built_in = copy.deepcopy(model.lines_presets)
+    model.lines_preset = "He II (2S3 > 2P3)"
+
+    model.edit_preset("shifts", 5.0, 1)
+    model.edit_preset("multiplier", 2.0)
+
+    assert model.lines_preset.value == "Edited: He II (2S3 > 2P3)"
+    preset = model.lines_presets[model.lines_preset.value]
+    assert preset["multiplier"] == 2.0
+    assert preset["shifts"][1] == 5.0
+    for name, preset in built_in.items():
+        assert model.lines_presets[name] == preset
+
+    model.lines_preset = "He II (2S3 > 2P3)"
+    model.edit_preset("coefficients", 0.5, 0)
+    assert model.lines_preset.value == "Edited: He II (2S3 > 2P3) (2)"
+
+
+
+def write_rows(file_path, vv, mode="a"):
+    with open(file_path, mode) as file:
+        if mode == "w":
+            file.write("VV FullAbs ResPart Thermal\n")
+        for value in vv:
+            file.write(f"{value:.8e} {np.exp(-value ** 2):.8e} 0 0\n")
+
+
+def watched_model(file_path):
+    write_rows(file_path, np.linspace(-5, 0, 501), "w")
+    model = Model()
+    model.is_watch_enabled = True
+    model.lines_preset = "Singlet"
+    model.data = str(file_path)
+    return model
+
+
+def test_limits_follow_watched_file(tmp_path):
+    file_path = tmp_path / "Absorption.dat"
+    model = watched_model(file_path)
+    assert model.x_max.value == pytest.approx(5)
+
+    write_rows(file_path, np.linspace(0.01, 5, 500))
+    model.reload()
+    assert model.data.value.grid[-1] == pytest.approx(5)
+    assert model.x_max.value == pytest.approx(10)
+    assert model.y_max.value == pytest.approx(1.0005)
+
+
+def test_edited_limits_are_kept_for_watched_file(tmp_path):
+    file_path = tmp_path / "Absorption.dat"
+    model = watched_model(file_path)
+    model.edit_limit("x_max", -1.0)
+
+    write_rows(file_path, np.linspace(0.01, 5, 500))
+    model.reload()
+    assert model.data.value.grid[-1] == pytest.approx(5)
+    assert model.x_max.value == -1.0
+
+    # A new file resets limits.
+    model.data = str(file_path)
+    assert model.x_max.value == pytest.approx(10)
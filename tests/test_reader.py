@@ -0,0 +1,170 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from trident.model import reader
+from trident.model.reader import _count_lines
+from trident.model.reader import FileFormatError
+from trident.model.reader import read_absorption
+from trident.model.reader import read_absorption_chunks
+from trident.model.reader import read_absorption_tail
+
+
+HEADER = "VV FullAbs ResPart Thermal\n"
+COLUMNS = ["VV", "FullAbs", "ResPart", "Thermal"]
+
+
+def rows(fmt, n_rows=500, seed=0):
+    rng = np.random.default_rng(seed)
+    vv = np.sort(rng.uniform(-50, 50, n_rows))
+    f = rng.lognormal(-5, 3, (3, n_rows)) * rng.choice([-1, 1], (3, n_rows))
+    return [fmt.format(*values) for values in zip(vv, *f)]
+
+
+def irregular(lines, seed=0):
+    rng = np.random.default_rng(seed)
+    return [" " * rng.integers(0, 3) +
+            " ".join(line.split()).replace(" ", " " * rng.integers(1, 4))
+            for line in lines]
+
+
+def with_nan(lines, row_indices):
+    for i in row_indices:
+        tokens = lines[i].split()
+        tokens[1] = "nan"
+        lines[i] = " ".join(tokens)
+    return lines
+
+
+def subnormal(n_rows=500, seed=0):
+    # Fixed width: FullAbs is below 1e-300 in every row, ResPart in some.
+    rng = np.random.default_rng(seed)
+    lines = []
+    for i, (vv, f) in enumerate(zip(np.sort(rng.uniform(-50, 50, n_rows)),
+                                    rng.lognormal(-5, 3, n_rows))):
+        res_part = (f"{f * 1e-310:+.16e}" if i % 50 == 3 else
+                    f"{f:+.17e}")
+        lines.append(f"{vv:+.17e} {f * 1e-300:+.16e} {res_part} +0\n")
+    return "".join(lines)
+
+
+CASES = {
+    "exponents": HEADER + "".join(
+        line + "\n" for line in rows("{:.8e} {:.8e} {:.8e} {:.8e}")),
+    "signs": HEADER + "".join(
+        line + "\n" for line in rows("{:+.8E} {:+.8E} {:+.8E} {:+.8E}")),
+    "decimals": HEADER + "".join(
+        line + "\n" for line in rows("{:12.6f} {:14.9f} {:14.9f} {:14.9f}")),
+    "fortran_exponents": HEADER + "".join(
+        line.replace("e", "D") + "\n"
+        for line in rows("{:.8e} {:.8e} {:.8e} {:.8e}")),
+    "crlf": HEADER.replace("\n", "\r\n") + "".join(
+        line + "\r\n" for line in rows("{:.8e} {:.8e} {:.8e} {:.8e}")),
+    "trailing_whitespace": HEADER + "".join(
+        line + "  \t\n" for line in rows("{:.8e} {:.8e} {:.8e} {:.8e}")),
+    "no_final_newline": HEADER + "\n".join(
+        rows("{:.8e} {:.8e} {:.8e} {:.8e}")),
+    "irregular": HEADER + "".join(
+        line + "\n" for line in irregular(rows("{:.8e} {:.8e} {:.8e} {:.8e}"))),
+    "irregular_fortran_exponents": HEADER + "".join(
+        line.replace("e", "d") + "\r\n"
+        for line in irregular(rows("{:.8e} {:.8e} {:.8e} {:.8e}"))),
+    "subnormal": HEADER + subnormal(),
+    "blank_lines_and_nan": HEADER + "".join(
+        line + "\n" + "\n" * (i % 7 == 0)
+        for i, line in enumerate(
+            with_nan(rows("{:.8e} {:.8e} {:.8e} {:.8e}"), [3, 250]))),
+}
+
+
+def assert_parsed(actual, expected, case):
+    if case == "subnormal":
+        # Parsed by the fallback path: pandas' default converter isn't
+        # correctly rounded for 17 significant digits.
+        np.testing.assert_array_max_ulp(actual, expected, 2)
+    else:
+        np.testing.assert_array_equal(actual, expected)
+
+
+def reference(text):
+    # Fortran exponents are not parsed by pandas.
+    text = text.replace("D", "E").replace("d", "e")
+    dataframe = pd.read_csv(io.StringIO(text), sep=r"\s+",
+                            float_precision="round_trip")
+    return {column: dataframe[column].to_numpy() for column in COLUMNS}
+
+
+def write(tmp_path, text):
+    file_path = tmp_path / "Absorption.dat"
+    file_path.write_bytes(text.encode())
+    return str(file_path)
+
+
+@pytest.mark.parametrize("case", CASES)
+def test_read_absorption_matches_pandas(tmp_path, case):
+    text = CASES[case]
+    file_path = write(tmp_path, text)
+    expected = reference(text)
+
+    data = read_absorption(file_path, COLUMNS)
+    for column in COLUMNS:
+        assert_parsed(data[column], expected[column], case)
+
+    chunks = list(read_absorption_chunks(file_path, COLUMNS, chunk_size=4096))
+    assert len(chunks) > 1
+    for column in COLUMNS:
+        assert_parsed(np.concatenate([chunk[column] for chunk in chunks]),
+                      expected[column], case)
+
+    # Only complete lines are read from the tail.
+    data, offset = read_absorption_tail(file_path, columns=COLUMNS)
+    n_rows = len(expected["VV"]) - (not text.endswith("\n"))
+    for column in COLUMNS:
+        assert_parsed(data[column], expected[column][:n_rows], case)
+
+
+@pytest.mark.parametrize("bad_line", [
+    "2.0 3.5 0",
+    "2.0 3.5 0 0 1",
+    "2.0 3.5 100",
+    "2.0 3.x 0 0",
+])
+def test_invalid_row_is_reported(tmp_path, bad_line):
+    lines = ["1.0 2.5 0 0"] * 3000
+    lines[1000] = bad_line
+    file_path = write(tmp_path, HEADER + "".join(
+        line + "\n" for line in lines))
+
+    with pytest.raises(FileFormatError, match="Line 1002:"):
+        read_absorption(file_path)
+    with pytest.raises(FileFormatError, match="Line 1002:"):
+        list(read_absorption_chunks(file_path, chunk_size=4096))
+    with pytest.raises(FileFormatError, match="Line 1002:"):
+        read_absorption_tail(file_path)
+
+
+def test_tail_line_numbers_are_counted_for_invalid_rows_only(
+        tmp_path, monkeypatch):
+    counted = []
+    def count_lines(*args):
+        counted.append(args)
+        return _count_lines(*args)
+    monkeypatch.setattr(reader, "_count_lines", count_lines)
+    text = HEADER + "1.0 2.5 0 0\n" * 3000
+    file_path = write(tmp_path, text)
+    offset = len(text)
+
+    # Appended rows of another layout are parsed by the fallback.
+    with open(file_path, "a") as file:
+        file.write("2.0 -3.5 0 0\n3.0 4.5e-3 0 0\n")
+    data, end = read_absorption_tail(file_path, offset)
+    np.testing.assert_array_equal(data["FullAbs"], [-3.5, 4.5e-3])
+    assert not counted
+
+    with open(file_path, "a") as file:
+        file.write("4.0 -3.5 0\n")
+    with pytest.raises(FileFormatError, match="Line 3004:"):
+        read_absorption_tail(file_path, end)
+    assert counted
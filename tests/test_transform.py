@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from trident.model import convolution
+from trident.model.transform import MAX_GRID_POINTS
+from trident.model.transform import output_grid
+from trident.model.transform import stack_columns
+from trident.model.transform import transform_spectrum
+
+
+COLUMNS = ["FullAbs", "ResPart", "Thermal"]
+
+
+def test_columns_with_duplicate_vv():
+    vv = np.array([0.0, 0.5, 1.0, 1.0, 1.5, 2.0])
+    data = {"FullAbs": np.array([0.1, 0.5, 1.0, 3.0, 0.5, 0.1])}
+    data["ResPart"] = data["FullAbs"] / 2
+    data["Thermal"] = data["FullAbs"] / 10
+    with np.errstate(all="raise"):
+        spectrum = transform_spectrum(vv, stack_columns(data, COLUMNS), 2,
+                                      [-1, 0.3], [0.25, 0.75],
+                                      engine="Direct", columns=COLUMNS)
+    for column in COLUMNS:
+        single = transform_spectrum(vv, data[column], 2, [-1, 0.3],
+                                    [0.25, 0.75], engine="Direct")
+        total = spectrum.lines(column=column)[0][1]
+        assert np.array_equal(total, single.total)
+
+
+@pytest.mark.parametrize("n_components, step, is_fft", [
+    (12, 0.05, False),
+    (256, 0.005, True),
+])
+def test_convolution_engine_is_within_tolerance(monkeypatch, n_components,
+                                                step, is_fft):
+    fft_calls = []
+    correlate_fft = convolution._correlate_fft
+    def spy(*args):
+        fft_calls.append(args)
+        correlate_fft(*args)
+    monkeypatch.setattr(convolution, "_correlate_fft", spy)
+
+    rng = np.random.default_rng(0)
+    vv = np.sort(np.concatenate([[-6, 6], rng.uniform(-6, 6, 20000)]))
+    f = np.exp(-vv ** 2)
+    multiplier = 1.3
+    shifts = np.sort(rng.uniform(-20, 20, n_components))
+    coefficients = rng.uniform(-1, 1, n_components)
+    grid = output_grid(vv, multiplier, shifts, "Uniform Step", step=step)
+    direct = transform_spectrum(vv, f, multiplier, shifts, coefficients,
+                                grid=grid, engine="Direct")
+    fast = transform_spectrum(vv, f, multiplier, shifts, coefficients,
+                              grid=grid, engine="Convolution")
+
+    # Documented bound: sum(|c_i|) * step^2 * max|F''| / 8 (F of VA).
+    bound = np.abs(coefficients).sum() * step ** 2 * 2 / multiplier ** 2 / 8
+    assert np.abs(fast.total - direct.total).max() <= bound
+    assert bool(fft_calls) == is_fft
+
+
+def test_uniform_grid_size_is_limited():
+    vv = np.linspace(0, 100, 11)
+    with pytest.raises(ValueError, match="maximum"):
+        output_grid(vv, 1, [0], "Uniform Step", step=1e-6)
+    with pytest.raises(ValueError, match="maximum"):
+        output_grid(vv, 1, [0], "Uniform Points",
+                    n_points=MAX_GRID_POINTS + 1)
+    assert output_grid(vv, 1, [0], "Uniform Step", step=0.5).size == 201
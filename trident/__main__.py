@@ -6,6 +6,13 @@ Compatible file format for parsing (commonly named as "Absorption.dat"):
     <float> <float> <float> <float>
     <...> <...> <...> <...>
 
+Usage:
+    trident - run graphical user interface.
+    trident batch ... - transform files without graphical user interface (see
+    `trident batch --help`).
+    trident sweep ... - transform a file with all combinations of lines preset
+    parameter values (see `trident sweep --help`).
+
 Development notes:
     Application architecture based on "MVP Passive View" pattern with some
     extensions (model <-> presenter <-> view bindings) due to Qt's signals/slots
@@ -14,6 +21,9 @@ Development notes:
     View is described at ui/.../view.py files (corresponding to each widget).
     Presenter is described at ui/.../presenter.py files (corresponding to each
     widget, if needed).
+    Headless batch processing is described at batch.py file, parameter sweeps
+    are described at sweep.py file. GUI modules are
+    imported lazily, so batch workers don't load Qt widgets.
 
 Author: Artem Shepelin
 License: GPLv3
@@ -22,17 +32,24 @@ Repository: https://github.com/deverte/gleipnir
 
 import sys
 
-from PyQt6.QtWidgets import QApplication
 
-from trident.model.model import Model
-from trident.ui.presenter import MainWindowPresenter
-from trident.ui.view import MainWindow
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from trident.batch import main as batch_main
+        sys.exit(batch_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "sweep":
+        from trident.sweep import main as sweep_main
+        sys.exit(sweep_main(sys.argv[2:]))
+
+    from PyQt6.QtWidgets import QApplication
 
+    from trident.model.model import Model
+    from trident.ui.presenter import MainWindowPresenter
+    from trident.ui.view import MainWindow
 
-def main():
     app = QApplication(sys.argv)
 
-    model = Model()
+    model = Model(is_async=True)
     view = MainWindow()
     presenter = MainWindowPresenter(model, view)
 
@@ -40,4 +57,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
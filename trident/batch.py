@@ -0,0 +1,218 @@
+"""
+Batch is a module for headless transformation of many "Absorption.dat" files.
+Files are fanned out over a process pool, each worker loads a file into its own
+`Model`, transforms it with the selected lines preset and writes requested
+output formats next to the input file (or into the output directory).
+Usage:
+    trident batch <directory or glob> [...] --preset "He II (2S3 > 2P3)"
+        --format csv png --workers 8
+    Use `--grid-step` or `--grid-points` to write results on a uniform grid
+    (union of shifted singlet grids is used by default).
+    Use `--single-precision` to process very large files in float32.
+    Use `--all-columns` to transform ResPart and Thermal columns along with
+    FullAbs (they are written as extra data columns).
+    Use `--stream` for files larger than memory: they are read and
+    transformed block by block (about `--chunk-size` MiB of input each) and
+    written straight to "csv" or "f64" outputs with direct interpolation
+    (see model/stream.py).
+    Data formats are described at model/export.py file.
+
+Author: Artem Shepelin
+License: GPLv3
+"""
+
+import argparse
+import concurrent.futures
+import glob
+import os
+import sys
+
+import numpy as np
+
+from trident.model import export
+from trident.model.model import Model
+from trident.model.reader import CHUNK_SIZE
+from trident.model.reader import DATA_COLUMNS
+from trident.model.stream import stream_transform
+
+
+FORMATS = [*export.data_formats().keys(), "png", "pdf", "svg"]
+
+
+def main(argv=None):
+    parser = _make_parser()
+    args = parser.parse_args(argv)
+    if not isinstance(args.grid_step, type(None)) and args.grid_step <= 0:
+        parser.error("--grid-step must be positive")
+    if not isinstance(args.grid_points, type(None)) and args.grid_points < 2:
+        parser.error("--grid-points must be at least 2")
+
+    file_paths = _find_files(args.inputs)
+    if not file_paths:
+        print("No input files found.", file=sys.stderr)
+        return 1
+
+    if args.stream:
+        unsupported = [file_format for file_format in args.format
+                       if file_format not in export.STREAM_FORMATS]
+        if unsupported:
+            print(f"Format(s) {', '.join(unsupported)} can't be streamed, "
+                  f"use {', '.join(export.STREAM_FORMATS)}.", file=sys.stderr)
+            return 1
+
+    root = None
+    if args.output_dir:
+        root = os.path.commonpath(
+            [os.path.dirname(os.path.abspath(path)) for path in file_paths])
+
+    failed = 0
+    with concurrent.futures.ProcessPoolExecutor(args.workers) as executor:
+        futures = {
+            executor.submit(process_file, path, args.preset, args.format,
+                            _output_head(path, args.output_dir, root),
+                            args.cache, args.grid_step,
+                            args.grid_points, args.single_precision,
+                            args.all_columns,
+                            args.chunk_size * 1024 ** 2 if args.stream
+                            else None): path
+            for path in file_paths}
+        for done, future in enumerate(
+                concurrent.futures.as_completed(futures), start=1):
+            path = futures[future]
+            try:
+                outputs, warning = future.result()
+                print(f"[{done}/{len(futures)}] {path} -> "
+                      f"{', '.join(outputs)}", file=sys.stderr)
+                if warning:
+                    print(f"[{done}/{len(futures)}] {path} WARNING: "
+                          f"{warning}", file=sys.stderr)
+            except Exception as e:
+                failed += 1
+                print(f"[{done}/{len(futures)}] {path} FAILED: "
+                      f"{type(e).__name__}: {e}", file=sys.stderr)
+
+    print(f"Processed {len(file_paths) - failed} of {len(file_paths)} files.",
+          file=sys.stderr)
+    return 1 if failed else 0
+
+
+def process_file(file_path, preset, formats, output_head, is_cache=False,
+                 grid_step=None, grid_points=None, is_single_precision=False,
+                 is_all_columns=False, chunk_size=None):
+    if chunk_size:
+        return _stream_file(file_path, preset, formats, output_head,
+                            grid_step, grid_points, is_single_precision,
+                            is_all_columns, chunk_size)
+    model = Model()
+    model.is_all_columns = is_all_columns
+    model.is_data_cache_enabled = is_cache
+    model.is_single_precision = is_single_precision
+    if grid_step:
+        model.grid_step = grid_step
+        model.grid_mode = "Uniform Step"
+    elif grid_points:
+        model.grid_points = grid_points
+        model.grid_mode = "Uniform Points"
+    model.lines_preset = preset
+    model.data = file_path
+
+    outputs = []
+    for file_format in formats:
+        output_file = f"{output_head}.{file_format}"
+        model.data_write(output_file)
+        outputs.append(output_file)
+    return outputs, model.warning.value
+
+
+def _find_files(inputs):
+    file_paths = []
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "**", "*.dat")
+        file_paths.extend(sorted(glob.glob(pattern, recursive=True)))
+    return list(dict.fromkeys(path for path in file_paths
+                              if os.path.isfile(path)))
+
+
+def _make_parser():
+    model = Model()
+    parser = argparse.ArgumentParser(
+        prog="trident batch",
+        description="Transform singlet absorption lines of many files without "
+                    "graphical user interface.")
+    parser.add_argument(
+        "inputs", nargs="+",
+        help="directories (searched recursively for *.dat files) or glob "
+             "patterns of input files")
+    parser.add_argument(
+        "-p", "--preset", default=model.lines_preset.value,
+        choices=list(model.lines_presets.keys()), help="lines preset")
+    parser.add_argument(
+        "-f", "--format", nargs="+", default=["csv"], choices=FORMATS,
+        help="output formats")
+    grid = parser.add_mutually_exclusive_group()
+    grid.add_argument(
+        "--grid-step", type=float, default=None,
+        help="write results on a uniform grid with this step")
+    grid.add_argument(
+        "--grid-points", type=int, default=None,
+        help="write results on a uniform grid with this number of points")
+    parser.add_argument(
+        "-s", "--single-precision", action="store_true",
+        help="parse and transform data in float32 (halves memory)")
+    parser.add_argument(
+        "-a", "--all-columns", action="store_true",
+        help="transform FullAbs, ResPart and Thermal columns in one pass")
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="read, transform and write files block by block (for files "
+             "larger than memory, csv and f64 formats only)")
+    parser.add_argument(
+        "--chunk-size", type=int, default=CHUNK_SIZE // 1024 ** 2,
+        help="size of input blocks in streaming mode (MiB)")
+    parser.add_argument(
+        "-o", "--output-dir", default=None,
+        help="output directory (by default outputs are written next to the "
+             "input files)")
+    parser.add_argument(
+        "-c", "--cache", action="store_true",
+        help="cache parsed input files in the user cache directory")
+    parser.add_argument(
+        "-w", "--workers", type=int, default=os.cpu_count(),
+        help="number of worker processes")
+    return parser
+
+
+def _output_head(file_path, output_dir, root):
+    path_head, path_tail = os.path.split(os.path.abspath(file_path))
+    name, ext = os.path.splitext(path_tail)
+    if output_dir:
+        # Files in `root` itself give "." (out/./a.csv without normpath).
+        path_head = os.path.normpath(
+            os.path.join(output_dir, os.path.relpath(path_head, root)))
+        os.makedirs(path_head, exist_ok=True)
+    return os.path.join(path_head, name)
+
+
+def _stream_file(file_path, preset, formats, output_head, grid_step,
+                 grid_points, is_single_precision, is_all_columns,
+                 chunk_size):
+    parameters = Model().lines_presets[preset]
+    grid_options = {"mode": "Union"}
+    if grid_step:
+        grid_options = {"mode": "Uniform Step", "step": grid_step}
+    elif grid_points:
+        grid_options = {"mode": "Uniform Points", "n_points": grid_points}
+    columns = DATA_COLUMNS if is_all_columns else ["FullAbs"]
+    dtype = np.float32 if is_single_precision else np.float64
+
+    outputs = [f"{output_head}.{file_format}" for file_format in formats]
+    n_rows, is_sufficient = stream_transform(
+        file_path, outputs, parameters["multiplier"], parameters["shifts"],
+        parameters["coefficients"], preset, grid_options, columns, dtype,
+        chunk_size)
+    warning = None
+    if not is_sufficient:
+        warning = (f"Singlet grid of {file_path} is too fine for single "
+                   f"precision, the result may be inaccurate.")
+    return outputs, warning
@@ -0,0 +1,112 @@
+"""
+Broadening is a module with instrumental broadening of transformed spectra: the
+total and all components are convolved with a normalized instrument profile
+(Gaussian, Lorentzian or pseudo-Voigt with a given FWHM) using FFT, so the
+result can be compared with observations directly.
+Development notes:
+    Convolution is done on a uniform grid. Spectra on other grids (e.g. union
+    grids) are resampled onto a uniform grid with the same number of points
+    first.
+    Kernels are sampled on the grid step and truncated at `KERNEL_WIDTHS`
+    FWHMs on each side, then normalized to unit sum (area is preserved).
+    Kernels are cached by (profile, FWHM, grid step) within
+    `KERNEL_CACHE_SIZE` bytes (shared by runner threads, hence the lock).
+    Pseudo-Voigt profile is `VOIGT_ETA * Lorentzian + (1 - VOIGT_ETA) *
+    Gaussian` with equal FWHMs.
+    Component rows spread by the kernel half-width, their bounds are widened
+    accordingly.
+    Totals of other data columns (`Spectrum.column_totals`) are broadened in
+    the same batched FFT as the total and components.
+
+Author: Artem Shepelin
+License: GPLv3
+"""
+
+import threading
+
+import numpy as np
+
+from trident.model.cache import TransformCache
+from trident.model.convolution import fft_size
+from trident.model.convolution import uniform_step
+from trident.model.spectrum import Spectrum
+from trident.model.transform import resample_spectrum
+
+
+KERNEL_CACHE_SIZE = 64 * 1024 ** 2
+KERNEL_WIDTHS = {"Gaussian": 3, "Lorentzian": 50, "Pseudo-Voigt": 50}
+PROFILES = ["None", "Gaussian", "Lorentzian", "Pseudo-Voigt"]
+VOIGT_ETA = 0.5
+
+_kernels = TransformCache(KERNEL_CACHE_SIZE)
+_kernels_lock = threading.Lock()
+
+
+def broaden_spectrum(spectrum, profile, fwhm):
+    if profile == "None" or fwhm <= 0 or spectrum.grid.size < 2:
+        return spectrum
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown broadening profile {profile!r}.")
+
+    grid = spectrum.grid
+    step = uniform_step(grid)
+    if isinstance(step, type(None)):
+        grid = np.linspace(grid[0], grid[-1], grid.size, dtype=grid.dtype)
+        spectrum = resample_spectrum(spectrum, grid)
+        step = (float(grid[-1]) - float(grid[0])) / (grid.size - 1)
+    kernel = broadening_kernel(profile, float(fwhm), step)
+    if kernel.size == 1:
+        return spectrum
+
+    half = kernel.size // 2
+    size = fft_size(grid.size + kernel.size - 1)
+    names = list(spectrum.column_totals)
+    rows = np.concatenate([spectrum.total[None, :], spectrum.components,
+                           *[spectrum.column_totals[name][None, :]
+                             for name in names]])
+    rows = np.fft.irfft(np.fft.rfft(rows, size) * np.fft.rfft(kernel, size),
+                        size)[:, half:half + grid.size]
+    rows = rows.astype(grid.dtype, copy=False)
+
+    n_components = len(spectrum.components)
+    components = rows[1:1 + n_components]
+    column_totals = dict(zip(names, rows[1 + n_components:]))
+    bounds = np.clip(spectrum.bounds + [-half, half], 0, grid.size)
+    for i, (start, stop) in enumerate(bounds):
+        components[i, :start] = 0
+        components[i, stop:] = 0
+    return Spectrum(grid, components, bounds, spectrum.multiplier,
+                    spectrum.shifts, spectrum.coefficients, spectrum.preset,
+                    rows[0], column_totals)
+
+
+def broadening_kernel(profile, fwhm, step):
+    key = (profile, fwhm, step)
+    with _kernels_lock:
+        kernel = _kernels.get(key)
+    if not isinstance(kernel, type(None)):
+        return kernel
+
+    half = int(np.ceil(KERNEL_WIDTHS[profile] * fwhm / step))
+    x = step * np.arange(-half, half + 1)
+    if profile == "Gaussian":
+        kernel = _gaussian(x, fwhm)
+    elif profile == "Lorentzian":
+        kernel = _lorentzian(x, fwhm)
+    else:
+        kernel = (VOIGT_ETA * _lorentzian(x, fwhm) +
+                  (1 - VOIGT_ETA) * _gaussian(x, fwhm))
+    kernel /= kernel.sum()
+    kernel.setflags(write=False)
+    with _kernels_lock:
+        _kernels.put(key, kernel, kernel.nbytes)
+    return kernel
+
+
+def _gaussian(x, fwhm):
+    sigma = fwhm / (2 * np.sqrt(2 * np.log(2)))
+    return np.exp(-0.5 * (x / sigma) ** 2)
+
+
+def _lorentzian(x, fwhm):
+    return 1 / (1 + (2 * x / fwhm) ** 2)
@@ -0,0 +1,175 @@
+"""
+Cache is a module with caches of intermediate results:
+    `DataCache` is an on-disk cache of parsed input files. Parsed columns are
+    stored as `.npy` files inside the user cache directory, so reopening the
+    same file maps the arrays into memory (zero copy) instead of tokenizing
+    text.
+    `TransformCache` is an in-memory cache of transformation results with a
+    memory budget in bytes.
+Development notes:
+    `DataCache` entry key is a hash of the absolute file path, size, modification time and
+    a content hash (first and last `HASH_BLOCK_SIZE` bytes of the file).
+    Entries of both caches are evicted in least recently used order when total
+    size of the cache exceeds `max_size` bytes (`DataCache` updates entry
+    directory modification time on each hit).
+
+Author: Artem Shepelin
+License: GPLv3
+"""
+
+import collections
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def default_directory():
+    if sys.platform == "win32":
+        root = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+        return os.path.join(root, "trident", "cache")
+    if sys.platform == "darwin":
+        return os.path.join(os.path.expanduser("~"), "Library", "Caches",
+                            "trident")
+    root = os.environ.get("XDG_CACHE_HOME",
+                          os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(root, "trident")
+
+
+class DataCache:
+    def __init__(self, directory=None, max_size=2 * 1024 ** 3):
+        self._directory = directory if directory else default_directory()
+        self._max_size = max_size
+
+
+    @property
+    def directory(self):
+        return self._directory
+
+
+    def get(self, file_path, columns):
+        entry = os.path.join(self._directory, self.key(file_path))
+        paths = [os.path.join(entry, f"{column}.npy") for column in columns]
+        if not all(os.path.exists(path) for path in paths):
+            return None
+        try:
+            data = {column: np.load(path, mmap_mode="r")
+                    for column, path in zip(columns, paths)}
+            os.utime(entry)
+        except (OSError, ValueError):
+            return None
+        return data
+
+
+    def key(self, file_path):
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{file_path}\0{stat.st_size}\0{stat.st_mtime_ns}"
+                      .encode())
+        with open(file_path, "rb") as file:
+            digest.update(file.read(HASH_BLOCK_SIZE))
+            if stat.st_size > 2 * HASH_BLOCK_SIZE:
+                file.seek(-HASH_BLOCK_SIZE, os.SEEK_END)
+                digest.update(file.read(HASH_BLOCK_SIZE))
+        return digest.hexdigest()
+
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+
+    def put(self, file_path, data):
+        entry = os.path.join(self._directory, self.key(file_path))
+        try:
+            os.makedirs(entry, exist_ok=True)
+            for column, values in data.items():
+                descriptor, temporary = tempfile.mkstemp(dir=entry,
+                                                         suffix=".tmp")
+                with os.fdopen(descriptor, "wb") as file:
+                    np.save(file, np.ascontiguousarray(values))
+                os.replace(temporary, os.path.join(entry, f"{column}.npy"))
+        except OSError:
+            return
+        self._evict()
+
+
+    def set_max_size(self, max_size):
+        self._max_size = max_size
+        self._evict()
+
+
+    def _evict(self):
+        if not os.path.isdir(self._directory):
+            return
+        entries = []
+        for name in os.listdir(self._directory):
+            entry = os.path.join(self._directory, name)
+            if not os.path.isdir(entry):
+                continue
+            size = sum(os.path.getsize(os.path.join(entry, file_name))
+                       for file_name in os.listdir(entry))
+            entries.append((os.path.getmtime(entry), size, entry))
+        total_size = sum(size for mtime, size, entry in entries)
+        for mtime, size, entry in sorted(entries):
+            if total_size <= self._max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total_size -= size
+
+
+class TransformCache:
+    def __init__(self, max_size=512 * 1024 ** 2):
+        self._entries = collections.OrderedDict()
+        self._max_size = max_size
+        self._size = 0
+
+
+    def clear(self):
+        self._entries.clear()
+        self._size = 0
+
+
+    def get(self, key):
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        return self._entries[key][0]
+
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+
+    def put(self, key, value, size):
+        if key in self._entries:
+            self._size -= self._entries.pop(key)[1]
+        if size > self._max_size:
+            return
+        self._entries[key] = (value, size)
+        self._size += size
+        self._evict()
+
+
+    def set_max_size(self, max_size):
+        self._max_size = max_size
+        self._evict()
+
+
+    @property
+    def size(self):
+        return self._size
+
+
+    def _evict(self):
+        while self._size > self._max_size:
+            value, size = self._entries.popitem(last=False)[1]
+            self._size -= size
@@ -0,0 +1,134 @@
+"""
+Convolution is a module with a convolution engine of multiplet transformation
+for presets with many components (dense multiplets, hyperfine line lists).
+The singlet is resampled onto the step of a uniform output grid once, and the
+whole preset is applied as one sparse shift-and-weight kernel: component `i`
+lands between two neighbouring grid offsets, so it contributes two kernel taps
+with linear interpolation weights `c_i * (1 - phase_i)` and `c_i * phase_i`.
+The kernel is applied with shifted slice additions or, when that is cheaper,
+with FFT correlation, so cost doesn't grow with the product of the input
+length and the number of components.
+Development notes:
+    Only uniform grids are supported (see `uniform_step`).
+    `f` can be a 2-D array (columns x rows): all columns share the kernel and
+    are correlated in one batched pass, totals are 2-D then.
+    Result is the total only: per-component rows are never built (a spectrum
+    of a dense line list with components would take components x grid
+    memory).
+    Tolerance: compared to direct interpolation (see transform.py) the only
+    difference is that the singlet is linearly interpolated between its
+    samples on the grid step instead of between its own points. The error is
+    zero where the singlet is linear over a grid step, and otherwise at most
+    `sum(|c_i|) * max|F(x) - F_h(x)|` (`F_h` is the sampled singlet), i.e.
+    about `sum(|c_i|) * step^2 * max|F''| / 8` for smooth singlets, plus at
+    most `sum(|c_i|) * max(F(va_min), F(va_max))` within one step outside of
+    singlet edges.
+
+Author: Artem Shepelin
+License: GPLv3
+"""
+
+import numpy as np
+
+
+FFT_COST = 4 # relative cost of one FFT point per log2 of size
+MIN_COMPONENTS = 8
+
+
+def convolution_total(grid, vv, f, multiplier, shifts, coefficients, step):
+    vv = np.asarray(vv)
+    dtype = vv.dtype
+    va = vv.astype(np.float64) * multiplier
+    f = np.asarray(f, dtype=np.float64)
+    is_columns = f.ndim == 2
+    f = np.atleast_2d(f)
+    if va.size > 1 and va[0] > va[-1]:
+        va = va[::-1]
+        f = f[:, ::-1]
+    shifts = np.asarray(shifts, dtype=np.float64)
+    coefficients = np.asarray(coefficients, dtype=np.float64)
+
+    # Singlet samples on the grid step, starting at its lower edge.
+    n_samples = int(np.ceil((va[-1] - va[0]) / step)) + 1
+    x = va[0] + step * np.arange(n_samples)
+    samples = np.stack([np.interp(x, va, row) for row in f])
+
+    # Grid point `k` of component `i` is the sample `k + offsets_i + phases_i`.
+    positions = (float(grid[0]) - shifts - va[0]) / step
+    offsets = np.floor(positions).astype(np.intp)
+    phases = positions - offsets
+    taps = np.concatenate([offsets, offsets + 1])
+    weights = np.concatenate([coefficients * (1 - phases),
+                              coefficients * phases])
+
+    total = np.zeros((len(f), grid.size))
+    if _is_fft_faster(len(shifts), n_samples, grid.size, taps):
+        _correlate_fft(samples, taps, weights, total)
+    else:
+        for tap, weight in zip(taps, weights):
+            start = max(-tap, 0)
+            stop = min(n_samples - tap, grid.size)
+            if start < stop:
+                total[:, start:stop] += (weight *
+                                         samples[:, start + tap:stop + tap])
+    total = total.astype(dtype, copy=False)
+    return total if is_columns else total[0]
+
+
+def fft_size(n):
+    # Smallest 5-smooth number not less than `n` (fast FFT length).
+    size = 2 ** int(np.ceil(np.log2(max(n, 1))))
+    power_5 = 1
+    while power_5 <= size:
+        power_35 = power_5
+        while power_35 <= size:
+            candidate = power_35 * 2 ** max(int(np.ceil(np.log2(
+                n / power_35))), 0)
+            size = min(size, candidate)
+            power_35 *= 3
+        power_5 *= 5
+    return size
+
+
+def is_convolution_suitable(grid, n_components):
+    return (n_components >= MIN_COMPONENTS and
+            not isinstance(uniform_step(grid), type(None)))
+
+
+def uniform_step(grid, rtol=1e-6):
+    # Returns step of a uniform grid (or None if grid isn't uniform).
+    if grid.size < 2:
+        return None
+    step = (float(grid[-1]) - float(grid[0])) / (grid.size - 1)
+    if step <= 0:
+        return None
+    deviation = np.max(np.abs(np.diff(grid) - grid.dtype.type(step)))
+    # Single precision grids deviate by their rounding errors.
+    tolerance = max(rtol * step, 4 * float(np.spacing(np.max(np.abs(
+        grid[[0, -1]])))))
+    return step if deviation <= tolerance else None
+
+
+def _correlate_fft(samples, taps, weights, total):
+    # total[k] = sum over taps of weight * samples[k + tap] (zero outside of
+    # samples), computed as a correlation of the padded samples with a dense
+    # kernel.
+    tap_min = int(taps.min())
+    kernel = np.bincount(taps - tap_min, weights=weights)
+    n_grid = total.shape[-1]
+    n_padded = n_grid + kernel.size - 1
+    padded = np.zeros((len(samples), n_padded))
+    start = max(-tap_min, 0)
+    stop = min(samples.shape[-1] - tap_min, n_padded)
+    if start < stop:
+        padded[:, start:stop] = samples[:, start + tap_min:stop + tap_min]
+    size = fft_size(n_padded)
+    spectrum = np.fft.rfft(padded, size) * np.conj(np.fft.rfft(kernel, size))
+    total[:] = np.fft.irfft(spectrum, size)[:, :n_grid]
+
+
+def _is_fft_faster(n_components, n_samples, n_grid, taps):
+    n_padded = n_grid + int(taps.max() - taps.min())
+    direct_cost = 2 * n_components * min(n_samples, n_grid)
+    fft_cost = FFT_COST * n_padded * np.log2(max(n_padded, 2))
+    return fft_cost < direct_cost
@@ -0,0 +1,179 @@
+"""
+Export is a module for writing transformed data and figures to files. It works
+on a snapshot of model state (a dictionary of property values, see
+`Model.snapshot`), so exports can run on worker threads while the model keeps
+changing.
+Data formats (grid and all data columns of `Spectrum.columns`, without text
+formatting except CSV):
+    .csv - comma separated values.
+    .npz - NumPy arrays archive (uncompressed): "grid" array and one array per
+    data column.
+    .feather - Feather (Arrow IPC) table with "grid" column first (requires
+    pyarrow).
+    .parquet - Apache Parquet table with "grid" column first (requires
+    pyarrow).
+    .f64 - raw little-endian float64 block with a small header:
+        8 bytes: magic b"TRIDF64\0";
+        uint32: number of columns (including grid);
+        uint64: number of rows;
+        for each column: uint16 name length and UTF-8 name;
+        column-major float64 values (grid first).
+    Any other extension is rendered as a figure.
+    `DataStream` writes a spectrum part by part (see model/stream.py) in
+    "csv" and "f64" formats (`STREAM_FORMATS`), output is the same as if the
+    parts were written at once. CSV parts are appended to the file, raw
+    columns are spooled into temporary files and joined on `close`.
+
+Author: Artem Shepelin
+License: GPLv3
+"""
+
+import os
+import shutil
+import struct
+import tempfile
+
+import numpy as np
+import pandas as pd
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+from trident.utils.renderer import render_figure
+
+
+RAW_MAGIC = b"TRIDF64\0"
+STREAM_FORMATS = ["csv", "f64"]
+
+
+class ExportError(Exception):
+    pass
+
+
+class DataStream:
+    def __init__(self, file_path):
+        self._file_format = os.path.splitext(file_path)[1][1:]
+        if self._file_format not in STREAM_FORMATS:
+            raise ValueError(f"Can't stream data to {file_path}, supported "
+                             f"formats: {', '.join(STREAM_FORMATS)}.")
+        self._file_path = file_path
+        self._n_rows = 0
+        self._spools = None
+        if self._file_format == "csv":
+            self._file = open(file_path, "w", newline="")
+        else:
+            self._file = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    def close(self):
+        if self._file_format == "csv":
+            self._file.close()
+            return
+        if isinstance(self._spools, type(None)):
+            return
+        spools, self._spools = self._spools, None
+        try:
+            with open(self._file_path, "wb") as file:
+                _write_raw_header(file, spools, self._n_rows)
+                for spool in spools.values():
+                    spool.seek(0)
+                    shutil.copyfileobj(spool, file)
+        finally:
+            for spool in spools.values():
+                spool.close()
+
+
+    def write(self, data):
+        if self._file_format == "csv":
+            data.to_dataframe().to_csv(self._file, header=not self._n_rows)
+        else:
+            columns = data.columns()
+            if isinstance(self._spools, type(None)):
+                self._spools = {name: tempfile.TemporaryFile()
+                                for name in columns}
+            for name, values in columns.items():
+                np.ascontiguousarray(values, dtype="<f8").tofile(
+                    self._spools[name])
+        self._n_rows += data.grid.size
+
+
+def data_formats():
+    formats = {
+        "csv": "Comma Separated Values",
+        "npz": "NumPy Arrays",
+        "f64": "Raw Float64 Block",
+    }
+    if pyarrow:
+        formats["feather"] = "Feather (Arrow IPC)"
+        formats["parquet"] = "Apache Parquet"
+    return formats
+
+
+def read_raw(file_path):
+    with open(file_path, "rb") as file:
+        if file.read(len(RAW_MAGIC)) != RAW_MAGIC:
+            raise ValueError(f"File {file_path} is not a raw float64 block.")
+        n_columns, n_rows = struct.unpack("<IQ", file.read(12))
+        names = []
+        for i in range(n_columns):
+            length, = struct.unpack("<H", file.read(2))
+            names.append(file.read(length).decode())
+        offset = file.tell()
+    values = np.memmap(file_path, dtype="<f8", mode="r", offset=offset,
+                       shape=(n_columns, n_rows))
+    return dict(zip(names, values))
+
+
+def write(state, file_path):
+    path_head, path_tail = os.path.split(file_path)
+    name, ext = os.path.splitext(path_tail)
+
+    try:
+        if ext[1:] in data_formats():
+            _write_data(state["data"], file_path, ext[1:])
+        else:
+            render_figure(state).savefig(
+                file_path, dpi=state["dpi"],
+                transparent=state["is_transparent_background"])
+    except Exception as e:
+        raise ExportError(f"Can't save file {file_path}.") from e
+
+
+def _write_data(data, file_path, file_format):
+    if file_format == "csv":
+        data.to_dataframe().to_csv(file_path)
+    elif file_format == "npz":
+        np.savez(file_path, **data.columns())
+    elif file_format == "f64":
+        _write_raw(data.columns(), file_path)
+    elif file_format in ["feather", "parquet"]:
+        table = pd.DataFrame(data.columns())
+        if file_format == "feather":
+            table.to_feather(file_path)
+        else:
+            table.to_parquet(file_path, index=False)
+
+
+def _write_raw(columns, file_path):
+    with open(file_path, "wb") as file:
+        _write_raw_header(file, columns, len(columns["grid"]))
+        for values in columns.values():
+            np.ascontiguousarray(values, dtype="<f8").tofile(file)
+
+
+def _write_raw_header(file, names, n_rows):
+    file.write(RAW_MAGIC)
+    file.write(struct.pack("<IQ", len(names), n_rows))
+    for name in names:
+        encoded = name.encode()
+        file.write(struct.pack("<H", len(encoded)))
+        file.write(encoded)
@@ -0,0 +1,141 @@
+"""
+Fit is a module for fitting of lines preset parameters (multiplier, shifts and
+coefficients) to an observed multiplet.
+Model of the multiplet: sum of `c_i * F((x - s_i) / m)` plus a constant
+baseline `b`, where `F` is the shifted singlet (FullAbs - min(FullAbs))
+linearly interpolated on VV (zero outside of the singlet grid). The baseline
+absorbs the offset of observed data (e.g. raw FullAbs of an "Absorption.dat"
+file, which isn't shifted like transformed spectra) and isn't returned.
+Development notes:
+    Variable projection: coefficients and the baseline enter the model
+    linearly, so for given multiplier and shifts they are solved exactly with
+    linear least squares (the basis has an extra constant column), and the
+    Levenberg-Marquardt loop runs only over multiplier and shifts.
+    Jacobian of the projected residual uses Kaufman's approximation with
+    analytic derivatives of the piecewise linear singlet (segment slopes).
+    Segment slopes of the singlet are computed once (`Singlet`) and reused by
+    every iteration, all components are evaluated with one vectorized lookup.
+    Observed multiplet can be an "Absorption.dat" file (VV and FullAbs
+    columns) or a CSV file exported by Trident ("grid" and "F" columns).
+
+Author: Artem Shepelin
+License: GPLv3
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from trident.model.reader import read_absorption
+
+
+class Singlet:
+    def __init__(self, vv, f):
+        vv = np.asarray(vv, dtype=np.float64)
+        f = np.asarray(f, dtype=np.float64)
+        f = f - np.min(f)
+        if vv.size > 1 and vv[0] > vv[-1]:
+            vv = vv[::-1]
+            f = f[::-1]
+        self._vv = vv
+        self._f = f
+        self._slopes = np.zeros(vv.size)
+        # Duplicate VV values give zero length segments without slopes.
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self._slopes[:-1] = np.diff(f) / np.diff(vv)
+        self._slopes[~np.isfinite(self._slopes)] = 0
+
+
+    def evaluate(self, u):
+        # Values and derivatives of the interpolated singlet at `u`.
+        index = np.searchsorted(self._vv, u, side="right") - 1
+        inside = (u >= self._vv[0]) & (u <= self._vv[-1])
+        index = np.clip(index, 0, self._vv.size - 1)
+        slopes = np.where(inside, self._slopes[index], 0.0)
+        values = np.where(inside, self._f[index] +
+                          slopes * (u - self._vv[index]), 0.0)
+        return values, slopes
+
+
+def fit_preset(vv, f, x, y, multiplier, shifts, max_iterations=100,
+               tolerance=1e-10):
+    singlet = Singlet(vv, f)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    parameters = np.array([multiplier, *shifts], dtype=np.float64)
+
+    cost, coefficients, jacobian, residual = _evaluate(singlet, x, y,
+                                                       parameters)
+    damping = 1e-3
+    for iteration in range(max_iterations):
+        gradient = jacobian.T @ residual
+        hessian = jacobian.T @ jacobian
+        diagonal = np.maximum(np.diag(hessian), 1e-12)
+
+        while True:
+            try:
+                step = np.linalg.solve(hessian + damping * np.diag(diagonal),
+                                       -gradient)
+            except np.linalg.LinAlgError:
+                damping *= 10
+                continue
+            candidate = parameters + step
+            if candidate[0] != 0:
+                result = _evaluate(singlet, x, y, candidate)
+                if result[0] < cost:
+                    break
+            damping *= 10
+            if damping > 1e12:
+                break
+        if damping > 1e12:
+            break
+
+        improvement = cost - result[0]
+        parameters = candidate
+        cost, coefficients, jacobian, residual = result
+        damping = max(damping / 10, 1e-12)
+        if (improvement <= tolerance * cost or
+                np.all(np.abs(step) <= tolerance *
+                       (np.abs(parameters) + tolerance))):
+            break
+
+    rms = float(np.sqrt(2 * cost / max(y.size, 1)))
+    return (float(parameters[0]), [float(shift) for shift in parameters[1:]],
+            [float(coefficient) for coefficient in coefficients], rms)
+
+
+def read_observed(file_path):
+    if os.path.splitext(file_path)[1].lower() == ".csv":
+        table = pd.read_csv(file_path)
+        x = table.iloc[:, 0].to_numpy(dtype=np.float64)
+        y = table.iloc[:, 1].to_numpy(dtype=np.float64)
+    else:
+        data = read_absorption(file_path, ["VV", "FullAbs"])
+        x, y = data["VV"], data["FullAbs"]
+    is_valid = np.isfinite(x) & np.isfinite(y)
+    return x[is_valid], y[is_valid]
+
+
+def _evaluate(singlet, x, y, parameters):
+    # Returns cost, coefficients, Jacobian of the projected residual with
+    # respect to (multiplier, shifts) and the residual.
+    multiplier, shifts = parameters[0], parameters[1:]
+    u = (x[:, None] - shifts[None, :]) / multiplier
+    basis, slopes = singlet.evaluate(u)
+    # Constant column of the baseline.
+    basis = np.hstack([basis, np.ones((x.size, 1))])
+
+    q, r = np.linalg.qr(basis)
+    solution = np.linalg.lstsq(basis, y, rcond=None)[0]
+    residual = y - basis @ solution
+    coefficients = solution[:-1]
+
+    # Derivatives of the model with respect to multiplier and each shift.
+    derivatives = np.empty((x.size, parameters.size))
+    derivatives[:, 0] = -(slopes * u / multiplier) @ coefficients
+    derivatives[:, 1:] = -slopes / multiplier * coefficients[None, :]
+    # Kaufman's approximation: project derivatives onto the orthogonal
+    # complement of the basis.
+    jacobian = -(derivatives - q @ (q.T @ derivatives))
+    return 0.5 * float(residual @ residual), coefficients, jacobian, residual
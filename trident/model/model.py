@@ -6,22 +6,51 @@ Development notes:
     To add a new data property:
     1) Define it inside `Model.__init__` function as Property.
     2) Add setter and getter of this property.
+    With `is_async=True`, loading, transformation, broadening, overlays and
+    fitting run on `TaskRunner` channels and errors are reported through
+    `error`; otherwise everything runs synchronously (batch processing).
+    Raw, transformed and broadened (`data`) spectra are kept separately, so
+    each stage reruns only when its own parameters change.
+    Built-in lines presets are never modified (edits and fits add presets).
 
 Author: Artem Shepelin
 License: GPLv3
 """
 
-import itertools
 import os
 
 import numpy as np
-import pandas as pd
 
+from trident.model import export
+from trident.model import fit
+from trident.model.broadening import broaden_spectrum
+from trident.model.broadening import PROFILES
+from trident.model.cache import DataCache
+from trident.model.cache import TransformCache
+from trident.model.convolution import is_convolution_suitable
+from trident.model.reader import DATA_COLUMNS
+from trident.model.reader import read_absorption
+from trident.model.reader import read_absorption_tail
+from trident.model.spectrum import Spectrum
+from trident.model.transform import basis_spectrum
+from trident.model.transform import component_bounds
+from trident.model.transform import GRID_MODES
+from trident.model.transform import is_precision_sufficient
+from trident.model.transform import output_grid
+from trident.model.transform import resample_spectrum
+from trident.model.transform import stack_columns
+from trident.model.transform import transform_spectrum
+from trident.model.transform import transform_basis
+from trident.model.transform import transform_tail
+from trident.utils.array_buffer import ArrayBuffer
+from trident.utils.export_queue import ExportQueue
 from trident.utils.property import Property
+from trident.utils.task_runner import TaskRunner
 
 
 class Model:
-    def __init__(self):
+    def __init__(self, is_async=False):
+        self._basis = None
         self._lines_presets = {
             "Singlet" : {
                 "multiplier": 1,
@@ -34,23 +63,59 @@ class Model:
                 "coefficients": [1 / 9, 3 / 9, 5 / 9]
             }
         }
-        self._raw_dataframe = None
+        self._built_in_presets = frozenset(self._lines_presets)
+        self._data_cache = DataCache()
+        self._data_key = None
+        self._export_queue = ExportQueue() if is_async else None
+        self._is_limits_edited = False
+        self._is_limits_outdated = False
+        self._overlay_raw_data = {}
+        self._overlay_spectra = {}
+        self._raw_data = None
+        self._raw_buffers = None
+        self._raw_data_key = None
+        self._raw_f_min = None
+        self._raw_offset = None
+        self._runner = TaskRunner() if is_async else None
+        self._spectrum_buffers = None
+        self._transform_cache = TransformCache()
+        self._transformed_data = None
 
         self._axes_color = Property("#344291")
         self._axes_labels_color = Property("#4e63e3")
         self._background_color = Property("#0f1016")
+        self._broadening_fwhm = Property(1.0)
+        self._broadening_profile = Property("None")
         self._data = Property(None)
+        self._data_cache_size = Property(self._data_cache.max_size)
         self._dpi = Property(100)
+        self._error = Property(None)
+        self._export_progress = Property((0, 0))
         self._figure_x = Property(8)
         self._figure_y = Property(6)
+        self._fit_result = Property(None)
+        self._grid_mode = Property("Union")
+        self._grid_points = Property(100000)
+        self._grid_step = Property(0.01)
         self._input_file = Property(None)
+        self._is_all_columns = Property(False)
+        self._is_busy = Property(False)
+        self._is_common_grid = Property(False)
+        self._is_data_cache_enabled = Property(False)
         self._is_show_intermediate_lines = Property(False)
+        self._is_single_precision = Property(False)
         self._is_transparent_background = Property(True)
+        self._is_watch_enabled = Property(False)
         self._lines_preset = Property("He II (2S3 > 2P3)")
         self._output_file = Property(None)
+        self._overlay_files = Property(())
+        self._overlays = Property(())
+        self._plot_column = Property("FullAbs")
         self._ticks_color = Property("#4e63e3")
         self._title = Property("Title")
         self._title_color = Property("#4e63e3")
+        self._transform_cache_size = Property(self._transform_cache.max_size)
+        self._warning = Property(None)
         self._x_axis_name = Property("X Axis")
         self._x_max = Property(1.0)
         self._x_min = Property(0.0)
@@ -58,16 +123,36 @@ class Model:
         self._y_max = Property(1.0)
         self._y_min = Property(0.0)
 
-        self._data.changed.connect(
-            lambda data: self._x_max.setValue(data.index.max() + 5))
-        self._data.changed.connect(
-            lambda data: self._x_min.setValue(data.index.min() - 5))
-        self._data.changed.connect(
-            lambda data: self._y_max.setValue(data["F"].max() + 0.0005))
-        self._data.changed.connect(
-            lambda data: self._y_min.setValue(data["F"].min() - 0.0005))
         self._data.changed.connect(self._on_file_open)
+        self._data.changed.connect(lambda : self._update_overlays())
+        self._is_common_grid.changed.connect(lambda : self._update_overlays())
+        self._is_all_columns.changed.connect(
+            lambda : self._on_read_options_changed())
+        self._is_single_precision.changed.connect(
+            lambda : self._on_read_options_changed())
+        self._plot_column.changed.connect(lambda : self._reset_y_limits())
+        self._overlay_files.changed.connect(lambda : self._load_overlays())
+        self._broadening_fwhm.changed.connect(lambda : self._broaden_data())
+        self._broadening_profile.changed.connect(
+            lambda : self._broaden_data())
+        self._data_cache_size.changed.connect(self._data_cache.set_max_size)
+        self._transform_cache_size.changed.connect(
+            self._transform_cache.set_max_size)
+        if self._runner:
+            self._runner.busyChanged.connect(self._is_busy.setValue)
+        if self._export_queue:
+            self._export_queue.progressChanged.connect(
+                lambda done, total: self._export_progress.setValue(
+                    (done, total)))
+            self._export_queue.failed.connect(
+                lambda file_path, error: self._error.setValue(error))
         self._lines_preset.changed.connect(lambda : self._transform_data())
+        self._lines_preset.changed.connect(lambda : self._load_overlays())
+        for grid_property in [self._grid_mode, self._grid_points,
+                              self._grid_step, self._x_max, self._x_min]:
+            grid_property.changed.connect(
+                lambda value, grid_property=grid_property:
+                    self._on_grid_changed(grid_property))
 
 
     @property
@@ -100,6 +185,31 @@ class Model:
         self._background_color.setValue(value)
 
 
+    @property
+    def broadening_fwhm(self):
+        return self._broadening_fwhm
+
+
+    @broadening_fwhm.setter
+    def broadening_fwhm(self, value):
+        self._broadening_fwhm.setValue(value)
+
+
+    @property
+    def broadening_profile(self):
+        return self._broadening_profile
+
+
+    @broadening_profile.setter
+    def broadening_profile(self, value):
+        self._broadening_profile.setValue(value)
+
+
+    @property
+    def broadening_profiles(self):
+        return PROFILES
+
+
     @property
     def data(self):
         return self._data
@@ -110,29 +220,46 @@ class Model:
         if self.input_file.value != file_path:
             self.input_file = file_path
         if os.path.exists(file_path):
-            try:
-                self._raw_dataframe = pd.read_csv(
-                    file_path, sep=" ", usecols=["VV", "FullAbs"])
-                self._transform_data()
-            except:
-                raise Exception # Invalid File Format
-                return
+            stat = os.stat(file_path)
+            key = (os.path.abspath(file_path), stat.st_size,
+                   stat.st_mtime_ns)
+            if self._runner:
+                self._runner.cancel("transform")
+                self._runner.submit(
+                    "data", lambda : self._read_data(file_path),
+                    lambda result: self._set_raw_data(*result, key),
+                    self._error.setValue)
+            else:
+                self._set_raw_data(*self._read_data(file_path), key)
         else:
             raise FileNotFoundError
 
 
-    def data_write(self, output_file, figure):
+    @property
+    def data_cache_size(self):
+        return self._data_cache_size
+
+
+    @data_cache_size.setter
+    def data_cache_size(self, value):
+        self._data_cache_size.setValue(value)
+
+
+    @property
+    def data_columns(self):
+        return DATA_COLUMNS
+
+
+    def data_write(self, output_file):
         if self.output_file.value != output_file:
             self.output_file = output_file
 
-        path_head, path_tail = os.path.split(self.output_file.value)
-        name, ext = os.path.splitext(path_tail)
-
-        if ext in [".csv"]:
-            self._data.value.to_csv(output_file)
+        state = self.snapshot()
+        if self._export_queue:
+            self._export_queue.submit(output_file,
+                                      lambda : export.write(state, output_file))
         else:
-            figure.savefig(self.output_file.value, dpi=self.dpi.value,
-                           transparent=self.is_transparent_background.value)
+            export.write(state, output_file)
 
 
     @property
@@ -145,6 +272,16 @@ class Model:
         self._dpi.setValue(value)
 
 
+    @property
+    def error(self):
+        return self._error
+
+
+    @property
+    def export_progress(self):
+        return self._export_progress
+
+
     @property
     def figure_x(self):
         return self._figure_x
@@ -165,6 +302,108 @@ class Model:
         self._figure_y.setValue(value)
 
 
+    def edit_limit(self, name, value):
+        if name not in ("x_max", "x_min", "y_max", "y_min"):
+            raise ValueError(f"Unknown plot limit {name!r}.")
+        # Limits edited by the user are kept when a watched file grows.
+        self._is_limits_edited = True
+        getattr(self, f"_{name}").setValue(value)
+
+
+    def edit_preset(self, parameter, value, row=0):
+        name = self._lines_preset.value
+        preset = self._lines_presets[name]
+        if parameter == "multiplier":
+            if preset["multiplier"] == value:
+                return
+            edited = {"multiplier": value}
+        elif parameter in ("shifts", "coefficients"):
+            values = list(preset[parameter])
+            if values[row] == value:
+                return
+            values[row] = value
+            edited = {parameter: values}
+        else:
+            raise ValueError(f"Unknown preset parameter {parameter!r}.")
+
+        if name in self._built_in_presets:
+            # Built-in presets are copied on write.
+            name = self._unique_preset_name(f"Edited: {name}")
+            self._lines_presets[name] = {
+                "multiplier": preset["multiplier"],
+                "shifts": list(preset["shifts"]),
+                "coefficients": list(preset["coefficients"]),
+                **edited
+            }
+            self.lines_preset = name
+            return
+        preset.update(edited)
+        self._transform_data()
+        self._load_overlays()
+
+
+    def fit_preset(self, file_path):
+        if isinstance(self._raw_data, type(None)):
+            raise ValueError("Open a singlet file before fitting.")
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(file_path)
+
+        preset = self._lines_presets[self._lines_preset.value]
+        multiplier = preset["multiplier"]
+        shifts = list(preset["shifts"])
+        raw_data = self._raw_data
+        compute = lambda : fit.fit_preset(
+            raw_data["VV"], raw_data["FullAbs"],
+            *fit.read_observed(file_path), multiplier, shifts)
+        on_finished = lambda result: self._set_fitted_preset(file_path,
+                                                             *result)
+        if self._runner:
+            self._runner.submit("fit", compute, on_finished,
+                                self._error.setValue)
+        else:
+            on_finished(compute())
+
+
+    @property
+    def fit_result(self):
+        return self._fit_result
+
+
+    @property
+    def grid_mode(self):
+        return self._grid_mode
+
+
+    @grid_mode.setter
+    def grid_mode(self, value):
+        self._grid_mode.setValue(value)
+
+
+    @property
+    def grid_modes(self):
+        return GRID_MODES
+
+
+    @property
+    def grid_points(self):
+        return self._grid_points
+
+
+    @grid_points.setter
+    def grid_points(self, value):
+        self._grid_points.setValue(value)
+
+
+    @property
+    def grid_step(self):
+        return self._grid_step
+
+
+    @grid_step.setter
+    def grid_step(self, value):
+        self._grid_step.setValue(value)
+
+
     @property
     def input_file(self):
         return self._input_file
@@ -175,6 +414,41 @@ class Model:
         self._input_file.setValue(value)
 
 
+    @property
+    def is_all_columns(self):
+        return self._is_all_columns
+
+
+    @is_all_columns.setter
+    def is_all_columns(self, value):
+        self._is_all_columns.setValue(value)
+
+
+    @property
+    def is_busy(self):
+        return self._is_busy
+
+
+    @property
+    def is_common_grid(self):
+        return self._is_common_grid
+
+
+    @is_common_grid.setter
+    def is_common_grid(self, value):
+        self._is_common_grid.setValue(value)
+
+
+    @property
+    def is_data_cache_enabled(self):
+        return self._is_data_cache_enabled
+
+
+    @is_data_cache_enabled.setter
+    def is_data_cache_enabled(self, value):
+        self._is_data_cache_enabled.setValue(value)
+
+
     @property
     def is_show_intermediate_lines(self):
         return self._is_show_intermediate_lines
@@ -185,6 +459,16 @@ class Model:
         self._is_show_intermediate_lines.setValue(value)
 
 
+    @property
+    def is_single_precision(self):
+        return self._is_single_precision
+
+
+    @is_single_precision.setter
+    def is_single_precision(self, value):
+        self._is_single_precision.setValue(value)
+
+
     @property
     def is_transparent_background(self):
         return self._is_transparent_background
@@ -195,6 +479,16 @@ class Model:
         self._is_transparent_background.setValue(value)
 
 
+    @property
+    def is_watch_enabled(self):
+        return self._is_watch_enabled
+
+
+    @is_watch_enabled.setter
+    def is_watch_enabled(self, value):
+        self._is_watch_enabled.setValue(value)
+
+
     @property
     def lines_presets(self):
         return self._lines_presets
@@ -220,6 +514,70 @@ class Model:
         self._output_file.setValue(value)
 
 
+    @property
+    def overlay_files(self):
+        return self._overlay_files
+
+
+    @overlay_files.setter
+    def overlay_files(self, value):
+        self._overlay_files.setValue(tuple(value))
+
+
+    @property
+    def overlays(self):
+        return self._overlays
+
+
+    @property
+    def plot_column(self):
+        return self._plot_column
+
+
+    @plot_column.setter
+    def plot_column(self, value):
+        self._plot_column.setValue(value)
+
+
+    def reload(self):
+        file_path = self.input_file.value
+        if (isinstance(self._raw_data_key, type(None)) or self.is_busy.value or
+                not file_path or not os.path.exists(file_path) or
+                os.path.abspath(file_path) != self._raw_data_key[0]):
+            return
+        stat = os.stat(file_path)
+        if (isinstance(self._raw_offset, type(None)) or
+                stat.st_size < self._raw_offset):
+            # Loaded without watching or truncated.
+            self.data = file_path
+            return
+        if stat.st_size == self._raw_offset:
+            return
+
+        offset = self._raw_offset
+        columns = ["VV", *self._columns()]
+        dtype = self._dtype()
+        compute = lambda : read_absorption_tail(file_path, offset, columns,
+                                                dtype)
+        on_finished = lambda result: self._append_raw_data(
+            file_path, offset, stat.st_mtime_ns, *result)
+        if self._runner:
+            self._runner.submit("data", compute, on_finished,
+                                self._on_reload_failed)
+        else:
+            on_finished(compute())
+
+
+    def snapshot(self):
+        state = {name[1:]: value.value for name, value in vars(self).items()
+                 if isinstance(value, Property)}
+        if (not isinstance(self._spectrum_buffers, type(None)) and
+                not isinstance(state["data"], type(None))):
+            # Buffers of the watched spectrum are overwritten by `reload`.
+            state["data"] = state["data"].copy()
+        return state
+
+
     @property
     def ticks_color(self):
         return self._ticks_color
@@ -250,6 +608,25 @@ class Model:
         self._title_color.setValue(value)
 
 
+    def transaction(self):
+        return Property.batch()
+
+
+    @property
+    def transform_cache_size(self):
+        return self._transform_cache_size
+
+
+    @transform_cache_size.setter
+    def transform_cache_size(self, value):
+        self._transform_cache_size.setValue(value)
+
+
+    @property
+    def warning(self):
+        return self._warning
+
+
     @property
     def x_axis_name(self):
         return self._x_axis_name
@@ -310,45 +687,436 @@ class Model:
         self._y_min.setValue(value)
 
 
+    def _append_raw_data(self, file_path, old_offset, mtime_ns, tail, offset):
+        if (self._raw_offset != old_offset or
+                self._raw_data_key[0] != os.path.abspath(file_path)):
+            # Another file is loaded meanwhile.
+            return
+        vv, f = tail["VV"], tail["FullAbs"]
+        if not vv.size:
+            return
+        old_vv = self._raw_data["VV"]
+        if ((old_vv.size and vv[0] <= old_vv[-1]) or
+                (vv.size > 1 and (np.diff(vv) <= 0).any())):
+            self.data = file_path
+            return
+
+        old_key = self._raw_data_key
+        old_vv_max = old_vv[-1] if old_vv.size else None
+        old_f_min = self._raw_f_min
+        for column, values in tail.items():
+            self._raw_buffers[column].append(values)
+        self._raw_data = {column: buffer.values
+                          for column, buffer in self._raw_buffers.items()}
+        self._raw_data_key = (old_key[0], offset, mtime_ns)
+        self._raw_f_min = min(old_f_min, float(np.min(f)))
+        self._raw_offset = offset
+
+        # Limits follow the growing data unless the user has edited them.
+        is_limits_outdated = not self._is_limits_edited
+        if isinstance(old_vv_max, type(None)):
+            self._transform_data()
+        elif self._raw_f_min != old_f_min:
+            self._transform_data(is_limits_outdated)
+        else:
+            self._extend_data(old_key, old_vv_max, is_limits_outdated)
+
+
+    def _broaden_data(self):
+        data = self._transformed_data
+        if isinstance(data, type(None)):
+            # Otherwise overlays are updated when broadened data is set.
+            self._update_overlays()
+            return
+        profile = self._broadening_profile.value
+        fwhm = self._broadening_fwhm.value
+        if profile == "None":
+            if self._runner:
+                self._runner.cancel("broadening")
+            self._set_broadened_data(data)
+            return
+
+        compute = lambda : broaden_spectrum(data, profile, fwhm)
+        if self._runner:
+            self._runner.submit("broadening", compute,
+                                self._set_broadened_data,
+                                self._error.setValue)
+        else:
+            self._set_broadened_data(compute())
+
+
+    def _check_precision(self, vv, multiplier, shifts):
+        if (self._dtype() is np.float64 or
+                is_precision_sufficient(vv, multiplier, shifts)):
+            self._warning.setValue(None)
+        else:
+            self._warning.setValue(
+                f"Singlet grid of {self.input_file.value} is too fine for "
+                f"single precision, the result may be inaccurate. Disable "
+                f"single precision mode for this file.")
+
+
+    def _columns(self):
+        return DATA_COLUMNS if self._is_all_columns.value else ["FullAbs"]
+
+
+    def _compute_spectrum(self, raw_data, multiplier, shifts, coefficients,
+                          preset_name, grid_options, columns, basis_key,
+                          basis):
+        # Returns spectrum and basis of direct interpolation (None if the
+        # convolution engine is used).
+        is_basis_valid = (not isinstance(basis, type(None)) and
+                          basis[0] == basis_key)
+        if is_basis_valid and basis[1] == tuple(shifts):
+            # Output grid doesn't depend on coefficients.
+            grid = basis[2]
+        else:
+            grid = output_grid(raw_data["VV"], multiplier, shifts,
+                               **grid_options)
+        f = stack_columns(raw_data, columns)
+        if is_convolution_suitable(grid, len(shifts)):
+            spectrum = transform_spectrum(raw_data["VV"], f, multiplier,
+                                          shifts, coefficients, preset_name,
+                                          grid, columns=columns)
+            return spectrum, None
+
+        rows = None
+        if is_basis_valid and (grid is basis[2] or
+                               np.array_equal(grid, basis[2])):
+            grid, rows = basis[2], basis[3]
+        rows = transform_basis(raw_data["VV"], f, multiplier, shifts, grid,
+                               rows)
+        spectrum = basis_spectrum(grid, rows, multiplier, shifts,
+                                  coefficients, preset_name, columns)
+        return spectrum, (basis_key, tuple(shifts), grid, rows)
+
+
+    def _dtype(self):
+        return np.float32 if self._is_single_precision.value else np.float64
+
+
+    def _extend_data(self, old_raw_key, old_vv_max, is_limits_outdated):
+        preset = self._lines_presets[self._lines_preset.value]
+        multiplier = preset["multiplier"]
+        shifts = list(preset["shifts"])
+        coefficients = list(preset["coefficients"])
+        grid_options = self._grid_options()
+        columns = self._columns()
+        parameters = (multiplier, tuple(shifts), tuple(coefficients),
+                      tuple(grid_options.items()), self._dtype().__name__,
+                      tuple(columns))
+        spectrum = self._transformed_data
+        if (multiplier <= 0 or isinstance(spectrum, type(None)) or
+                grid_options["mode"] != "Union" or len(columns) > 1 or
+                len(spectrum.bounds) != len(shifts) or
+                self._data_key != (old_raw_key, *parameters)):
+            self._transform_data(is_limits_outdated)
+            return
+        if self._runner:
+            self._runner.cancel("transform")
+
+        buffers = self._spectrum_buffers
+        if isinstance(buffers, type(None)):
+            buffers = {"grid": ArrayBuffer(spectrum.grid),
+                       "components": ArrayBuffer(spectrum.components),
+                       "total": ArrayBuffer(spectrum.total)}
+
+        vv = self._raw_data["VV"]
+        shifted_f = self._raw_data["FullAbs"] - self._raw_f_min
+        cutoff, grid, components = transform_tail(
+            vv, shifted_f, multiplier, shifts, coefficients, old_vv_max)
+        size = int(np.searchsorted(buffers["grid"].values, cutoff,
+                                   side="right"))
+        for buffer in buffers.values():
+            buffer.truncate(size)
+        buffers["grid"].append(grid)
+        buffers["components"].append(components)
+        buffers["total"].append(components.sum(axis=0))
+
+        grid = buffers["grid"].values
+        spectrum = Spectrum(grid, buffers["components"].values,
+                            component_bounds(grid, vv, multiplier, shifts),
+                            multiplier, shifts, coefficients,
+                            self._lines_preset.value, buffers["total"].values)
+        self._set_data((self._raw_data_key, *parameters), spectrum, buffers,
+                       is_limits_outdated)
+
+
+    def _load_overlays(self):
+        preset = self._lines_presets[self._lines_preset.value]
+        multiplier = preset["multiplier"]
+        shifts = list(preset["shifts"])
+        coefficients = list(preset["coefficients"])
+        preset_name = self._lines_preset.value
+        grid_options = self._grid_options()
+        columns = self._columns()
+
+        file_paths = self._overlay_files.value
+        for file_path in list(self._overlay_raw_data):
+            if file_path not in file_paths:
+                del self._overlay_raw_data[file_path]
+                if self._runner:
+                    self._runner.cancel(f"overlay {file_path}")
+        self._overlay_spectra = {}
+        self._update_overlays()
+
+        for file_path in file_paths:
+            cached = self._overlay_raw_data.get(file_path)
+            compute = lambda file_path=file_path, cached=cached: (
+                self._read_overlay(file_path, cached, multiplier, shifts,
+                                   coefficients, preset_name, grid_options,
+                                   columns))
+            on_finished = lambda result, file_path=file_path: (
+                self._set_overlay(file_path, *result))
+            if self._runner:
+                self._runner.submit(f"overlay {file_path}", compute,
+                                    on_finished, self._error.setValue)
+            else:
+                on_finished(compute())
+
+
+    def _grid_options(self):
+        mode = self._grid_mode.value
+        if mode == "Uniform Step":
+            return {"mode": mode, "step": self._grid_step.value}
+        if mode == "Uniform Points":
+            return {"mode": mode, "n_points": self._grid_points.value}
+        if mode == "Window":
+            return {"mode": mode,
+                    "window": (self._x_min.value, self._x_max.value)}
+        return {"mode": mode}
+
+
     def _on_file_open(self):
         path_head, path_tail = os.path.split(self.input_file.value)
         name, ext = os.path.splitext(path_tail)
         self.output_file = os.path.join(path_head, name + ".png")
 
 
-    def _transform_data(self):
-        if not isinstance(self._raw_dataframe, type(None)):
-            preset = self._lines_presets[self._lines_preset.value]
-            multiplier = preset["multiplier"]
-            shifts = preset["shifts"]
-            coefficients = preset["coefficients"]
+    def _on_grid_changed(self, grid_property):
+        if (grid_property in (self._x_max, self._x_min) and
+                self._grid_mode.value != "Window"):
+            return
+        self._transform_data()
+        self._load_overlays()
+
+
+    def _on_read_options_changed(self):
+        if not self._is_all_columns.value:
+            self._plot_column.setValue("FullAbs")
+        self._overlay_raw_data = {}
+        self._load_overlays()
+        file_path = self.input_file.value
+        if (not isinstance(self._raw_data_key, type(None)) and file_path and
+                os.path.exists(file_path)):
+            self.data = file_path
+
 
-            vv = self._raw_dataframe["VV"]
-            shifted_f = (self._raw_dataframe["FullAbs"] -
-                         np.min(self._raw_dataframe["FullAbs"]))
+    def _on_reload_failed(self, error):
+        # Otherwise the error is reported on every poll of the file.
+        self._is_watch_enabled.setValue(False)
+        self._error.setValue(error)
 
-            va = vv * multiplier
 
-            vi = [va + shift for shift in shifts]
-            fi = [shifted_f * coeff for coeff in coefficients]
+    def _read_overlay(self, file_path, cached, multiplier, shifts,
+                      coefficients, preset_name, grid_options, columns):
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(file_path)
+        stat = os.stat(file_path)
+        key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        if not isinstance(cached, type(None)) and cached[0] == key:
+            raw_data = cached[1]
+        else:
+            raw_data = self._read_data(file_path)[0]
+        grid = output_grid(raw_data["VV"], multiplier, shifts, **grid_options)
+        spectrum = transform_spectrum(raw_data["VV"],
+                                      stack_columns(raw_data, columns),
+                                      multiplier, shifts, coefficients,
+                                      preset_name, grid, columns=columns)
+        return key, raw_data, spectrum
+
+
+    def _read_data(self, file_path):
+        columns = ["VV", *self._columns()]
+        dtype = self._dtype()
+        if self.is_watch_enabled.value:
+            return read_absorption_tail(file_path, None, columns, dtype)
+        if not self.is_data_cache_enabled.value:
+            return read_absorption(file_path, columns, dtype), None
+        # Cache entries are always float64.
+        raw_data = self._data_cache.get(file_path, columns)
+        if raw_data is None:
+            raw_data = read_absorption(file_path, columns)
+            self._data_cache.put(file_path, raw_data)
+        if dtype is not np.float64:
+            raw_data = {column: values.astype(dtype)
+                        for column, values in raw_data.items()}
+        return raw_data, None
+
+
+    def _reset_y_limits(self):
+        data = self._data.value
+        if isinstance(data, type(None)) or not data.grid.size:
+            return
+        values = data.lines(column=self._plot_column.value)[0][1]
+        with self.transaction():
+            self._y_max.setValue(float(values.max()) + 0.0005)
+            self._y_min.setValue(float(values.min()) - 0.0005)
+
+
+    def _set_broadened_data(self, data):
+        with self.transaction():
+            self._data.setValue(data)
+            if not self._is_limits_outdated or not data.grid.size:
+                return
+            self._is_limits_outdated = False
+            if self._grid_mode.value != "Window":
+                self._x_max.setValue(float(data.grid.max()) + 5)
+                self._x_min.setValue(float(data.grid.min()) - 5)
+            self._reset_y_limits()
+
+
+    def _set_data(self, key, data, buffers=None, is_limits_outdated=True):
+        self._data_key = key
+        self._spectrum_buffers = buffers
+        self._transformed_data = data
+        # Pending reset of limits (broadening is asynchronous) isn't cancelled.
+        self._is_limits_outdated |= is_limits_outdated
+        self._broaden_data()
+
+
+    def _set_fitted_preset(self, file_path, multiplier, shifts, coefficients,
+                           rms):
+        name = self._unique_preset_name(
+            f"Fit: {os.path.basename(file_path)}")
+        self._lines_presets[name] = {
+            "multiplier": multiplier,
+            "shifts": shifts,
+            "coefficients": coefficients
+        }
+        self.lines_preset = name
+        self._fit_result.setValue((name, rms))
 
-            vs = np.sort(list(itertools.accumulate(vi, func=np.append))[-1])
 
-            get_xs = lambda x_all, x_peak: x_all[(np.min(x_peak) <= x_all) &
-                                                 (x_all <= np.max(x_peak))]
-            interp_peak = lambda x_all, x_peak, y_peak: (
-                np.interp(get_xs(x_all, x_peak), x_peak, y_peak))
+    def _set_overlay(self, file_path, key, raw_data, spectrum):
+        if file_path not in self._overlay_files.value:
+            return
+        self._overlay_raw_data[file_path] = (key, raw_data)
+        self._overlay_spectra[file_path] = spectrum
+        self._update_overlays()
 
-            interp_dfs = [pd.DataFrame(interp_peak(vs, v, f),
-                                       index=get_xs(vs, v), columns=["F"])
-                          for (v, f) in zip(vi, fi)]
 
-            df_res = list(
-                itertools.accumulate(
-                    interp_dfs,
-                    lambda prv, nxt: prv.add(nxt, fill_value=0.0)))[-1]
-            if len(coefficients) > 1:
-                for i, coefficient in enumerate(coefficients):
-                    df_res[f"{coefficient}"] = interp_dfs[i]
+    def _set_raw_data(self, raw_data, offset, key):
+        self._is_limits_edited = False
+        self._raw_offset = offset
+        if isinstance(offset, type(None)):
+            self._raw_buffers = None
+            self._raw_f_min = None
+        else:
+            # Watched files: the key follows the parsed part of the file.
+            key = (key[0], offset, key[2])
+            self._raw_buffers = {column: ArrayBuffer(values)
+                                 for column, values in raw_data.items()}
+            raw_data = {column: buffer.values
+                        for column, buffer in self._raw_buffers.items()}
+            f = raw_data["FullAbs"]
+            self._raw_f_min = float(np.min(f)) if f.size else np.inf
+        self._raw_data = raw_data
+        self._raw_data_key = key
+        self._transform_data()
+
+
+    def _set_transformed_data(self, key, data, basis=None,
+                              is_limits_outdated=True):
+        self._basis = basis
+        self._transform_cache.put(key, data, data.nbytes)
+        self._set_data(key, data, None, is_limits_outdated)
+
+
+    def _transform_data(self, is_limits_outdated=True):
+        if not isinstance(self._raw_data, type(None)):
+            preset = self._lines_presets[self._lines_preset.value]
+            multiplier = preset["multiplier"]
+            shifts = list(preset["shifts"])
+            coefficients = list(preset["coefficients"])
+            grid_options = self._grid_options()
+
+            columns = self._columns()
+            key = (self._raw_data_key, multiplier, tuple(shifts),
+                   tuple(coefficients), tuple(grid_options.items()),
+                   self._dtype().__name__, tuple(columns))
+            self._check_precision(self._raw_data["VV"], multiplier, shifts)
+            spectrum = self._transform_cache.get(key)
+            if not isinstance(spectrum, type(None)):
+                if self._runner:
+                    self._runner.cancel("transform")
+                self._set_data(key, spectrum, None, is_limits_outdated)
+                return
 
-            self._data.setValue(df_res)
\ No newline at end of file
+            raw_data = self._raw_data
+            preset_name = self._lines_preset.value
+            basis_key = (self._raw_data_key, multiplier,
+                         tuple(grid_options.items()), self._dtype().__name__,
+                         tuple(columns))
+            basis = self._basis
+            compute = lambda : self._compute_spectrum(
+                raw_data, multiplier, shifts, coefficients, preset_name,
+                grid_options, columns, basis_key, basis)
+            if self._runner:
+                self._runner.submit(
+                    "transform", compute,
+                    lambda result: self._set_transformed_data(
+                        key, *result, is_limits_outdated),
+                    self._error.setValue)
+            else:
+                self._set_transformed_data(key, *compute(),
+                                           is_limits_outdated)
+
+
+    def _unique_preset_name(self, base_name):
+        name = base_name
+        number = 1
+        while name in self._lines_presets:
+            number += 1
+            name = f"{base_name} ({number})"
+        return name
+
+
+    def _update_overlays(self):
+        spectra = [self._overlay_spectra[file_path]
+                   for file_path in self._overlay_files.value
+                   if file_path in self._overlay_spectra]
+        data = self._data.value
+        profile = self._broadening_profile.value
+        fwhm = self._broadening_fwhm.value
+        is_common_grid = self._is_common_grid.value
+        if not spectra or (not is_common_grid and profile == "None"):
+            if self._runner:
+                self._runner.cancel("overlays")
+            self._overlays.setValue(tuple(spectra))
+            return
+
+        grid = None
+        if is_common_grid:
+            grid = (spectra[0].grid if isinstance(data, type(None)) else
+                    data.grid)
+            if not isinstance(self._spectrum_buffers, type(None)):
+                # Buffers of the watched spectrum are overwritten by
+                # `reload`.
+                grid = grid.copy()
+
+        def compute():
+            # Overlays are broadened like `data` (on their own grids) before
+            # resampling.
+            overlays = [broaden_spectrum(spectrum, profile, fwhm)
+                        for spectrum in spectra]
+            if is_common_grid:
+                overlays = [resample_spectrum(spectrum, grid)
+                            for spectrum in overlays]
+            return tuple(overlays)
+
+        if self._runner:
+            self._runner.submit("overlays", compute, self._overlays.setValue,
+                                self._error.setValue)
+        else:
+            self._overlays.setValue(compute())
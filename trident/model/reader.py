@@ -0,0 +1,440 @@
+"""
+Reader is a module with a dedicated parser for "Absorption.dat" files:
+    VV FullAbs ResPart Thermal
+    <float> <float> <float> <float>
+    <...> <...> <...> <...>
+Requested columns are parsed straight into contiguous float64 (or float32 with
+`dtype=np.float32`) NumPy arrays.
+Development notes:
+    Fast path: if every data line has the same length and the same separator
+    positions (typical for solver outputs), the memory-mapped file is viewed as
+    a (rows x line length) byte matrix and each requested column is tokenized
+    and converted to floats with vectorized NumPy operations, chunk by chunk.
+    Values with up to 15 significant digits and decimal exponents within
+    [-22, 22] are converted exactly (correctly rounded), other values are
+    within one unit in the last place. Fortran "D" exponents ("1.5D+03") are
+    accepted as "E" ones. Values that need powers of ten beyond [-308, 308]
+    (e.g. subnormal ones) are left to the fallback path. Only separators of
+    columns that are not requested are checked, their values are not parsed.
+    Fallback path: files with irregular layout (whitespace runs of variable
+    length, "nan"/"inf" tokens, blank lines) are parsed with pandas' C
+    tokenizer. All columns are parsed, so rows with a wrong number of values
+    are found even if they are not requested.
+    Invalid rows are reported with `FileFormatError` containing the line
+    number (1-based, counting the header line).
+    `read_absorption_tail` parses only complete lines appended after a byte
+    offset, which allows incremental reloading of growing files.
+    `read_absorption_chunks` parses a file block by block (about
+    `chunk_size` bytes of complete lines each), so files larger than memory
+    can be processed with bounded memory.
+    `DATA_COLUMNS` are the columns that can be transformed (FullAbs is the
+    main one).
+
+Author: Artem Shepelin
+License: GPLv3
+"""
+
+import io
+import mmap
+import os
+
+import numpy as np
+import pandas as pd
+
+
+CHUNK_ROWS = 1 << 16
+CHUNK_SIZE = 16 * 1024 ** 2
+DATA_COLUMNS = ["FullAbs", "ResPart", "Thermal"]
+SPACES = b" \t\r"
+
+_POW10 = 10 ** np.arange(19, dtype=np.int64)
+_POW10F = np.array([10.0 ** i for i in range(309)])
+_EXPONENTS = bytes.maketrans(b"Dd", b"Ee")
+
+
+class FileFormatError(ValueError):
+    pass
+
+
+def read_absorption(file_path, columns=("VV", "FullAbs"), dtype=np.float64):
+    with open(file_path, "rb") as file:
+        header = file.readline()
+        n_columns, indices = _column_indices(header, columns)
+
+        data = None
+        if os.fstat(file.fileno()).st_size > len(header):
+            with mmap.mmap(file.fileno(), 0,
+                           access=mmap.ACCESS_READ) as buffer:
+                data = _read_fixed(buffer, len(header), n_columns, indices,
+                                   dtype=dtype)
+        else:
+            data = [np.empty(0, dtype=dtype) for index in indices]
+    if data is None:
+        data = _read_delimited(file_path, n_columns, indices, skiprows=1,
+                               dtype=dtype)
+    return dict(zip(columns, data))
+
+
+def read_absorption_chunks(file_path, columns=("VV", "FullAbs"),
+                           dtype=np.float64, chunk_size=CHUNK_SIZE):
+    # Yields data of consecutive blocks of complete lines.
+    with open(file_path, "rb") as file:
+        header = file.readline()
+        n_columns, indices = _column_indices(header, columns)
+        line_number = 2
+        rest = b""
+        while True:
+            block = file.read(chunk_size)
+            chunk = rest + block
+            if block:
+                end = chunk.rfind(b"\n") + 1
+                if not end:
+                    rest = chunk
+                    continue
+                chunk, rest = chunk[:end], chunk[end:]
+            if not chunk:
+                return
+            data = _read_fixed(chunk, 0, n_columns, indices, len(chunk),
+                               dtype)
+            if data is None:
+                data = _read_delimited(io.BytesIO(chunk), n_columns, indices,
+                                       skiprows=0,
+                                       first_line_number=line_number,
+                                       dtype=dtype)
+            line_number += chunk.count(b"\n")
+            yield dict(zip(columns, data))
+            if not block:
+                return
+
+
+def read_absorption_tail(file_path, offset=None, columns=("VV", "FullAbs"),
+                         dtype=np.float64):
+    # Reads complete lines after `offset` byte position (right after the
+    # header if None). Returns data and the offset right after the last
+    # complete line, so a partially written last line is read next time.
+    with open(file_path, "rb") as file:
+        header = file.readline()
+        n_columns, indices = _column_indices(header, columns)
+        if offset is None:
+            offset = len(header)
+
+        data = None
+        chunk = b""
+        end = offset
+        if os.fstat(file.fileno()).st_size > offset:
+            with mmap.mmap(file.fileno(), 0,
+                           access=mmap.ACCESS_READ) as buffer:
+                end = buffer.rfind(b"\n", offset) + 1
+                if end > offset:
+                    data = _read_fixed(buffer, offset, n_columns, indices,
+                                       end, dtype)
+                    if data is None:
+                        chunk = buffer[offset:end]
+        if end <= offset:
+            return {column: np.empty(0, dtype=dtype)
+                    for column in columns}, offset
+    if data is None:
+        data = _read_delimited(io.BytesIO(chunk), n_columns, indices,
+                               skiprows=0,
+                               first_line_number=lambda : _count_lines(
+                                   file_path, offset) + 1,
+                               dtype=dtype)
+    return dict(zip(columns, data)), end
+
+
+def _check_rows(lines, n_columns, first_line_number):
+    # `first_line_number` can be a function (e.g. counting lines of a file
+    # before a tail), it is called only if a row is invalid.
+    for i, line in enumerate(lines):
+        tokens = line.split()
+        if not tokens:
+            continue
+        error = None
+        if len(tokens) != n_columns:
+            error = f"expected {n_columns} values, got {len(tokens)}."
+        else:
+            for token in tokens:
+                try:
+                    float(token.translate(_EXPONENTS))
+                except ValueError:
+                    error = (f"invalid value "
+                             f"{token.decode(errors='replace')!r}.")
+                    break
+        if error:
+            if callable(first_line_number):
+                first_line_number = first_line_number()
+            raise FileFormatError(f"Line {first_line_number + i}: {error}")
+
+
+def _column_indices(header, columns):
+    names = header.decode(errors="replace").split()
+    missing = [column for column in columns if column not in names]
+    if missing:
+        raise FileFormatError(
+            f"Line 1: missing column(s) {', '.join(missing)} in header.")
+    return len(names), [names.index(column) for column in columns]
+
+
+def _count_lines(file_path, offset):
+    count = 0
+    with open(file_path, "rb") as file:
+        while offset > 0:
+            block = file.read(min(offset, 1 << 24))
+            if not block:
+                break
+            count += block.count(b"\n")
+            offset -= len(block)
+    return count
+
+
+def _parse_fields(fields):
+    values = _parse_template(fields)
+    if values is None:
+        values = _parse_tokens(fields)
+    return values
+
+
+def _parse_template(fields):
+    # Every row has the same shape of token as the first row (same positions
+    # of digits, dot and exponent), only signs may differ.
+    template = fields[0].tobytes()
+    token = template.strip(SPACES)
+    if not token:
+        return None
+    token_start = template.index(token)
+    token_end = token_start + len(token)
+
+    sign_positions = []
+    if token[:1] in (b"-", b"+"):
+        sign_positions.append(token_start)
+    elif token_start > 0:
+        sign_positions.append(token_start - 1)
+    exponent_position = max(token.find(letter) for letter in b"eEdD")
+    if exponent_position >= 0:
+        exponent_position += token_start
+        if template[exponent_position + 1:exponent_position + 2] not in (
+                b"-", b"+"):
+            return None
+        sign_positions.append(exponent_position + 1)
+    else:
+        exponent_position = token_end
+
+    digit_positions = [i for i in range(token_start, token_end)
+                       if template[i:i + 1].isdigit()]
+    fixed_positions = [i for i in range(token_start, token_end)
+                       if i not in digit_positions and i not in sign_positions]
+    space_positions = [i for i in range(len(template))
+                       if i < token_start - 1 or i >= token_end or
+                       (i == token_start - 1 and i not in sign_positions)]
+    if any(template[i:i + 1] not in b".eEdD" for i in fixed_positions):
+        return None
+
+    mantissa_positions = [i for i in digit_positions if i < exponent_position]
+    exponent_positions = [i for i in digit_positions if i > exponent_position]
+    if not mantissa_positions or len(mantissa_positions) > 18:
+        return None
+
+    digits = fields[:, digit_positions] - np.uint8(48)
+    signs = fields[:, sign_positions]
+    if ((digits > 9).any() or
+            (fields[:, fixed_positions] !=
+             np.frombuffer(template, dtype=np.uint8)[fixed_positions]).any()
+            or not np.isin(fields[:, space_positions],
+                           np.frombuffer(SPACES, dtype=np.uint8)).all()
+            or not np.isin(signs,
+                           np.frombuffer(b" +-", dtype=np.uint8)).all()):
+        return None
+    if (exponent_position < token_end and
+            (signs[:, -1] == 32).any()):
+        return None
+
+    n_mantissa = len(mantissa_positions)
+    weights = _POW10[n_mantissa - 1::-1]
+    if n_mantissa <= 15:
+        mantissa = digits[:, :n_mantissa].astype(np.float64) @ weights
+    else:
+        mantissa = (digits[:, :n_mantissa].astype(np.int64) @
+                    weights).astype(np.float64)
+
+    dot_position = template.find(b".", token_start, exponent_position)
+    power = np.full(len(fields), -sum(
+        i > dot_position for i in mantissa_positions) if dot_position >= 0
+        else 0, dtype=np.int64)
+    if exponent_positions:
+        exponent = digits[:, n_mantissa:].astype(np.int64) @ _POW10[
+            len(exponent_positions) - 1::-1]
+        power += np.where(signs[:, -1] == 45, -exponent, exponent)
+    if (np.abs(power) > 308).any():
+        # Beyond the table of powers (e.g. subnormal values).
+        return None
+
+    positive = power >= 0
+    mantissa[positive] *= _POW10F[power[positive]]
+    mantissa[~positive] /= _POW10F[-power[~positive]]
+    if token_start > 0 or token[:1] in (b"-", b"+"):
+        mantissa[signs[:, 0] == 45] *= -1
+    return mantissa
+
+
+def _parse_tokens(fields):
+    # fields: (rows x width) byte matrix, one right-aligned or left-aligned
+    # numeric token per row, surrounded by whitespace.
+    width = fields.shape[1]
+    position = np.arange(width)
+
+    space = np.isin(fields, np.frombuffer(SPACES, dtype=np.uint8))
+    digit = (fields >= 48) & (fields <= 57)
+    dot = fields == 46
+    minus = fields == 45
+    sign = minus | (fields == 43)
+    exponent = np.isin(fields, np.frombuffer(b"eEdD", dtype=np.uint8))
+    if not (space | digit | dot | sign | exponent).all():
+        return None
+
+    # Exactly one contiguous token per row.
+    token = ~space
+    starts = token[:, 0].astype(np.int64) + (
+        token[:, 1:] & space[:, :-1]).sum(axis=1)
+    if (starts != 1).any() or (exponent.sum(axis=1) > 1).any():
+        return None
+
+    has_exponent = exponent.any(axis=1)
+    exponent_index = np.where(has_exponent, exponent.argmax(axis=1), width)
+    is_mantissa = position < exponent_index[:, None]
+
+    mantissa_digit = digit & is_mantissa
+    exponent_digit = digit & ~is_mantissa
+    n_digits = mantissa_digit.sum(axis=1)
+    if ((n_digits < 1) | (n_digits > 18)).any():
+        return None
+    if ((dot & ~is_mantissa).any() or (dot.sum(axis=1) > 1).any() or
+            ((sign & is_mantissa).sum(axis=1) > 1).any() or
+            ((sign & ~is_mantissa).sum(axis=1) > 1).any() or
+            (has_exponent & ~exponent_digit.any(axis=1)).any()):
+        return None
+
+    values = (fields - 48).astype(np.int64)
+
+    digits_after = (mantissa_digit[:, ::-1].cumsum(axis=1)[:, ::-1] -
+                    mantissa_digit)
+    mantissa = np.where(mantissa_digit, values * _POW10[digits_after],
+                        0).sum(axis=1)
+
+    dot_index = np.where(dot.any(axis=1), dot.argmax(axis=1), exponent_index)
+    fraction_digits = (mantissa_digit &
+                       (position > dot_index[:, None])).sum(axis=1)
+
+    exponent_digits_after = np.minimum(
+        exponent_digit[:, ::-1].cumsum(axis=1)[:, ::-1] - exponent_digit, 18)
+    exponent_value = np.where(exponent_digit,
+                              values * _POW10[exponent_digits_after],
+                              0).sum(axis=1)
+    exponent_value[(minus & ~is_mantissa).any(axis=1)] *= -1
+
+    power = exponent_value - fraction_digits
+    if (np.abs(power) > 308).any():
+        return None
+    result = mantissa.astype(np.float64)
+    positive = power >= 0
+    result[positive] *= _POW10F[power[positive]]
+    result[~positive] /= _POW10F[-power[~positive]]
+    result[(minus & is_mantissa).any(axis=1)] *= -1
+    return result
+
+
+def _read_delimited(source, n_columns, indices, skiprows,
+                    first_line_number=2, dtype=np.float64):
+    def check_rows():
+        if isinstance(source, io.BytesIO):
+            source.seek(0)
+            _check_rows(source, n_columns, first_line_number)
+        else:
+            with open(source, "rb") as file:
+                for i in range(skiprows):
+                    file.readline()
+                _check_rows(file, n_columns, first_line_number)
+
+    try:
+        data = _read_csv(source, skiprows, dtype, na_filter=False)
+    except (ValueError, pd.errors.ParserError):
+        check_rows()
+        # Rows are valid, but have "nan" tokens or Fortran exponents.
+        if isinstance(source, io.BytesIO):
+            text = source.getvalue()
+        else:
+            with open(source, "rb") as file:
+                for i in range(skiprows):
+                    file.readline()
+                text = file.read()
+        try:
+            data = _read_csv(io.BytesIO(text.translate(_EXPONENTS)), 0, dtype,
+                             na_filter=True)
+        except (ValueError, pd.errors.ParserError):
+            raise FileFormatError("Invalid file format.") from None
+    if (len(data) != n_columns or
+            any(np.isnan(column).any() for column in data)):
+        # Short rows are filled with NaN by the tokenizer.
+        check_rows()
+    return [np.ascontiguousarray(data[index]) for index in indices]
+
+
+def _read_csv(source, skiprows, dtype, na_filter):
+    dataframe = pd.read_csv(source, sep=r"\s+", header=None,
+                            skiprows=skiprows, dtype=dtype,
+                            na_filter=na_filter, engine="c")
+    return [dataframe[index].to_numpy() for index in dataframe.columns]
+
+
+def _read_fixed(buffer, offset, n_columns, indices, end=None,
+                dtype=np.float64):
+    end = len(buffer) if end is None else end
+    line_end = buffer.find(b"\n", offset, end)
+    if line_end < 0:
+        return None
+    line_length = line_end + 1 - offset
+    size = end - offset
+    n_rows, remainder = divmod(size, line_length)
+    if remainder not in (0, line_length - 1) or n_rows == 0:
+        return None
+
+    # Field spans from the first data line: every span starts right after the
+    # previous token, so it starts with a separator (except the first one).
+    first_line = buffer[offset:line_end]
+    is_space = [byte in SPACES for byte in first_line]
+    ends = [i + 1 for i in range(len(first_line))
+            if not is_space[i] and (i + 1 == len(first_line) or
+                                    is_space[i + 1])]
+    if len(ends) != n_columns:
+        return None
+    spans = [(0 if index == 0 else ends[index - 1], ends[index])
+             for index in indices]
+
+    rows = np.frombuffer(buffer, dtype=np.uint8, count=n_rows * line_length,
+                         offset=offset).reshape(n_rows, line_length)
+    # Separators of all columns, so rows with merged values are not taken
+    # (checked chunk by chunk while rows are in cache).
+    separators = ends[:-1]
+    spaces = np.frombuffer(SPACES, dtype=np.uint8)
+
+    data = [np.empty(n_rows + (remainder > 0), dtype=dtype) for span in spans]
+    for chunk_start in range(0, n_rows, CHUNK_ROWS):
+        chunk = rows[chunk_start:chunk_start + CHUNK_ROWS]
+        if ((chunk[:, -1] != 10).any() or
+                not np.isin(chunk[:, separators], spaces).all()):
+            return None
+        for column, (start, stop) in zip(data, spans):
+            values = _parse_fields(chunk[:, start:stop])
+            if values is None:
+                return None
+            column[chunk_start:chunk_start + len(values)] = values
+
+    if remainder:
+        tokens = buffer[offset + n_rows * line_length:end].split()
+        if len(tokens) != n_columns:
+            return None
+        try:
+            for column, index in zip(data, indices):
+                column[-1] = float(tokens[index].translate(_EXPONENTS))
+        except ValueError:
+            return None
+    return data
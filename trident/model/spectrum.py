@@ -0,0 +1,95 @@
+"""
+Spectrum is a module with a compact array-backed container of transformed
+spectra. It holds one grid array, a 2-D (components x grid) matrix of
+components and metadata (preset, multiplier, shifts, coefficients), and gives
+zero-copy views for plotting and export. Conversion to pandas is done only on
+demand (`Spectrum.to_dataframe`).
+Development notes:
+    Each component occupies a contiguous slice of the grid (see `bounds`), the
+    rest of its row is filled with zeros, so `total` is a plain sum of rows.
+    Exported component columns are NaN outside of their slices.
+    Component names are coefficients (as before), duplicates get a "(n)"
+    suffix with the component number.
+    Spectra of the convolution engine hold the total only: `components` has
+    no rows and `bounds` is empty, so only the total is plotted and exported.
+    `column_totals` holds totals of other transformed data columns (e.g.
+    {"ResPart": ..., "Thermal": ...}, `total` is the main FullAbs column).
+    They are exported after the components and can be plotted instead of the
+    main total (`lines(column=...)`).
+
+Author: Artem Shepelin
+License: GPLv3
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class Spectrum:
+    __slots__ = ("bounds", "coefficients", "column_totals", "components",
+                 "grid", "multiplier", "preset", "shifts", "total")
+
+
+    def __init__(self, grid, components, bounds, multiplier, shifts,
+                 coefficients, preset=None, total=None, column_totals=None):
+        self.bounds = bounds
+        self.coefficients = tuple(coefficients)
+        self.column_totals = column_totals if column_totals else {}
+        self.components = components
+        self.grid = grid
+        self.multiplier = multiplier
+        self.preset = preset
+        self.shifts = tuple(shifts)
+        self.total = components.sum(axis=0) if total is None else total
+
+
+    def columns(self):
+        columns = {"grid": self.grid, "F": self.total}
+        if len(self.bounds) > 1:
+            for i, name in enumerate(self.component_names()):
+                start, stop = self.bounds[i]
+                column = np.full(self.grid.size, np.nan,
+                                 dtype=self.components.dtype)
+                column[start:stop] = self.components[i, start:stop]
+                columns[name] = column
+        columns.update(self.column_totals)
+        return columns
+
+
+    def component_names(self):
+        names = [f"{coefficient}" for coefficient in self.coefficients]
+        return [f"{name} ({i + 1})" if names.count(name) > 1 else name
+                for i, name in enumerate(names)]
+
+
+    def copy(self):
+        return Spectrum(self.grid.copy(), self.components.copy(),
+                        self.bounds.copy(), self.multiplier, self.shifts,
+                        self.coefficients, self.preset, self.total.copy(),
+                        {name: total.copy()
+                         for name, total in self.column_totals.items()})
+
+
+    def lines(self, is_show_intermediate_lines=False, column=None):
+        # Components are shown for the main column only.
+        if column in self.column_totals:
+            return [(self.grid, self.column_totals[column])]
+        lines = [(self.grid, self.total)]
+        if is_show_intermediate_lines and len(self.bounds) > 1:
+            for i, (start, stop) in enumerate(self.bounds):
+                lines.append((self.grid[start:stop],
+                              self.components[i, start:stop]))
+        return lines
+
+
+    @property
+    def nbytes(self):
+        return (self.grid.nbytes + self.components.nbytes + self.bounds.nbytes +
+                self.total.nbytes +
+                sum(total.nbytes for total in self.column_totals.values()))
+
+
+    def to_dataframe(self):
+        columns = self.columns()
+        grid = columns.pop("grid")
+        return pd.DataFrame(columns, index=grid)
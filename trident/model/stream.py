@@ -0,0 +1,201 @@
+"""
+Stream is a module with an out-of-core (streaming) multiplet transformation
+for files larger than memory. The input is read in blocks of sorted VV rows,
+each block is transformed together with an overlap of previous rows and the
+result is appended straight to CSV or raw float64 files (see
+`export.DataStream`), so peak memory depends on the block size and the
+preset, not on the file size.
+Development notes:
+    Two passes over the file: the first one finds the singlet range and the
+    minimum of every data column (the baseline, see `transform`), the second
+    one transforms.
+    Output grid points `x` below `cutoff = VV_last * multiplier + min(shifts)`
+    (with the next to last row of the rows read so far, so interpolation
+    always has a row above) depend only on rows that are already read. Rows
+    within the shift span (`max(shifts) - min(shifts)`) below the cutoff are
+    kept for the next block, the rest is dropped.
+    Grid points of a block, component bounds and interpolation are computed
+    with the same functions and arithmetic as the in-memory direct
+    transformation (see transform.py), so results are identical to
+    `transform_spectrum(..., engine="Direct")` written at once. Supported grid
+    modes are "Union", "Uniform Step" and "Uniform Points" (uniform grids
+    are generated by index ranges with the same formulas as `output_grid`).
+    Every block is transformed once and written to all output files (one
+    `DataStream` per file).
+    Input VV must be sorted in non-decreasing order (duplicate values, e.g.
+    of float32 rounding, are allowed as in the in-memory transformation).
+
+Author: Artem Shepelin
+License: GPLv3
+"""
+
+import contextlib
+import itertools
+
+import numpy as np
+
+from trident.model.export import DataStream
+from trident.model.reader import CHUNK_SIZE
+from trident.model.reader import read_absorption_chunks
+from trident.model.spectrum import Spectrum
+from trident.model.transform import interpolate_columns
+from trident.model.transform import interpolate_components
+from trident.model.transform import is_precision_sufficient
+from trident.model.transform import stack_columns
+
+
+def stream_transform(file_path, output_files, multiplier, shifts,
+                     coefficients, preset=None, grid_options=None,
+                     columns=("FullAbs",), dtype=np.float64,
+                     chunk_size=CHUNK_SIZE):
+    # Returns number of written rows and whether precision of `dtype` is
+    # sufficient for the singlet grid.
+    if multiplier <= 0:
+        raise ValueError("Streaming requires a positive multiplier.")
+    grid_options = grid_options if grid_options else {"mode": "Union"}
+    columns = list(columns)
+    read_columns = ["VV", *columns]
+    va_first, va_last, f_min, is_sufficient = _scan(
+        file_path, read_columns, dtype, chunk_size, multiplier, shifts)
+    shifts_array = np.asarray(shifts, dtype=dtype)
+    va_starts = va_first + shifts_array
+    va_stops = va_last + shifts_array
+    grid_window = _grid_window(grid_options, float(va_first), float(va_last),
+                               shifts, dtype)
+
+    vv = np.empty(0, dtype=dtype)
+    f = np.empty((*f_min.shape[:-1], 0), dtype=dtype)
+    lower = -np.inf
+    n_rows = 0
+    with contextlib.ExitStack() as stack:
+        streams = [stack.enter_context(DataStream(output_file))
+                   for output_file in output_files]
+        chunks = read_absorption_chunks(file_path, read_columns, dtype,
+                                        chunk_size)
+        for data in itertools.chain(chunks, [None]):
+            if not isinstance(data, type(None)):
+                vv = np.concatenate([vv, data["VV"]])
+                f = np.concatenate([f, stack_columns(data, columns) - f_min],
+                                   axis=-1)
+                if vv.size < 2:
+                    continue
+                va = vv * vv.dtype.type(multiplier)
+                upper = va[-2] + shifts_array.min()
+            else:
+                va = vv * vv.dtype.type(multiplier)
+                upper = np.inf
+
+            grid = grid_window(va, lower, upper)
+            if grid.size:
+                bounds = np.stack([
+                    np.searchsorted(grid, va_starts, side="left"),
+                    np.searchsorted(grid, va_stops, side="right")], axis=1)
+                spectrum = _spectrum(grid, vv, f, multiplier, shifts,
+                                     coefficients, preset, columns, bounds)
+                for stream in streams:
+                    stream.write(spectrum)
+                n_rows += grid.size
+            lower = upper
+
+            # Rows within the shift span below the cutoff can be needed by
+            # grid points above it (and two rows before them for
+            # interpolation).
+            head = max(int(np.searchsorted(va, upper - shifts_array.max(),
+                                           side="left")) - 2, 0)
+            vv = vv[head:]
+            f = f[..., head:]
+    return n_rows, is_sufficient
+
+
+def _grid_window(grid_options, va_min, va_max, shifts, dtype):
+    # Returns a function of (va, lower, upper) that gives output grid points
+    # within [lower, upper) (`va` holds all rows that can produce them).
+    mode = grid_options["mode"]
+    if mode == "Union":
+        shifts = np.asarray(shifts, dtype=dtype)
+        def union_window(va, lower, upper):
+            grid = np.unique(np.concatenate([va + shift for shift in shifts]))
+            return grid[np.searchsorted(grid, lower, side="left"):
+                        np.searchsorted(grid, upper, side="left")]
+        return union_window
+
+    start = va_min + min(shifts)
+    stop = va_max + max(shifts)
+    if mode == "Uniform Step":
+        step = grid_options.get("step")
+        if not step or step <= 0:
+            raise ValueError("Grid step must be positive.")
+        size = int((stop - start) // step) + 1
+        values = lambda indices: start + step * indices
+    elif mode == "Uniform Points":
+        size = grid_options.get("n_points")
+        if not size or size < 2:
+            raise ValueError("Grid must have at least 2 points.")
+        size = int(size)
+        step = (stop - start) / (size - 1)
+        # Same arithmetic as `np.linspace`.
+        values = lambda indices: np.where(indices == size - 1, stop,
+                                          indices * step + start)
+    else:
+        raise ValueError(f"Grid mode {mode!r} is not supported by streaming.")
+
+    def index(value):
+        # Number of grid points below `value`.
+        if value == np.inf:
+            return size
+        i = int(np.clip(np.ceil((float(value) - start) / step), 0, size))
+        while i > 0 and values(np.float64(i - 1)).astype(dtype) >= value:
+            i -= 1
+        while i < size and values(np.float64(i)).astype(dtype) < value:
+            i += 1
+        return i
+
+    def uniform_window(va, lower, upper):
+        indices = np.arange(index(lower), index(upper), dtype=np.float64)
+        return values(indices).astype(dtype, copy=False)
+    return uniform_window
+
+
+def _scan(file_path, columns, dtype, chunk_size, multiplier, shifts):
+    # First pass: singlet range, minimum of data columns and precision check.
+    va_first = None
+    va_last = None
+    f_min = None
+    is_sufficient = True
+    for data in read_absorption_chunks(file_path, columns, dtype, chunk_size):
+        vv = data["VV"]
+        if not vv.size:
+            continue
+        if (not isinstance(va_last, type(None)) and
+                vv[0] * vv.dtype.type(multiplier) < va_last or
+                (np.diff(vv) < 0).any()):
+            raise ValueError(f"VV of {file_path} must be sorted in "
+                             f"non-decreasing order for streaming.")
+        va = vv * vv.dtype.type(multiplier)
+        if isinstance(va_first, type(None)):
+            va_first = va[0]
+        va_last = va[-1]
+        minimum = np.min(stack_columns(data, columns[1:]), axis=-1,
+                         keepdims=True)
+        f_min = minimum if isinstance(f_min, type(None)) else np.minimum(
+            f_min, minimum)
+        if np.dtype(dtype) == np.float32:
+            is_sufficient &= is_precision_sufficient(vv, multiplier, shifts)
+    if isinstance(va_first, type(None)):
+        raise ValueError(f"File {file_path} has no data rows.")
+    return va_first, va_last, f_min, bool(is_sufficient)
+
+
+def _spectrum(grid, vv, f, multiplier, shifts, coefficients, preset, columns,
+              bounds):
+    if f.ndim == 1:
+        components = interpolate_components(grid, vv, f, multiplier, shifts,
+                                            coefficients, bounds)
+        column_totals = None
+    else:
+        components, totals = interpolate_columns(grid, vv, f, multiplier,
+                                                 shifts, coefficients, bounds)
+        column_totals = dict(zip(columns[1:], totals))
+    return Spectrum(grid, components, bounds, multiplier, shifts,
+                    coefficients, preset, components.sum(axis=0),
+                    column_totals)
@@ -0,0 +1,99 @@
+"""
+Sweep is a module for evaluation of many variants of a lines preset at once
+(parameter sweeps). Every combination of swept parameter values is a variant,
+and all variants are transformed onto one common uniform grid with batched
+2-D NumPy operations (variants x grid), chunked to fit a memory budget.
+Development notes:
+    Parameter names: "multiplier", "shift_<n>" and "coefficient_<n>" (`n` is
+    1-based component number).
+    Component `i` of a variant is `c_i * F((grid - s_i) / m)`, where `F` is the
+    shifted singlet (FullAbs - min(FullAbs)) interpolated on VV and is zero
+    outside of the singlet grid, so one `np.interp` call evaluates a component
+    for a whole chunk of variants.
+    Variants are ordered as a C-ordered product of the axes (last axis varies
+    fastest), so totals can be reshaped to (*axes sizes, grid size).
+
+Author: Artem Shepelin
+License: GPLv3
+"""
+
+import numpy as np
+
+
+MAX_MEMORY = 256 * 1024 ** 2
+
+
+def parameter_names(n_components):
+    return ["multiplier",
+            *[f"shift_{i + 1}" for i in range(n_components)],
+            *[f"coefficient_{i + 1}" for i in range(n_components)]]
+
+
+def sweep_grid(vv, multipliers, shifts, n_points=None, step=None):
+    vv = np.asarray(vv, dtype=np.float64)
+    ends = np.outer(multipliers, [vv[0], vv[-1]])
+    start = float(np.min(ends.min(axis=1) + shifts.min(axis=1)))
+    stop = float(np.max(ends.max(axis=1) + shifts.max(axis=1)))
+    if step:
+        if step <= 0:
+            raise ValueError("Grid step must be positive.")
+        return start + step * np.arange(int((stop - start) // step) + 1)
+    if not n_points or n_points < 2:
+        raise ValueError("Grid must have at least 2 points.")
+    return np.linspace(start, stop, int(n_points))
+
+
+def sweep_totals(vv, f, grid, multipliers, shifts, coefficients,
+                 max_memory=MAX_MEMORY, out=None):
+    vv = np.asarray(vv, dtype=np.float64)
+    f = np.asarray(f, dtype=np.float64)
+    shifted_f = f - np.min(f)
+    if vv.size > 1 and vv[0] > vv[-1]:
+        vv = vv[::-1]
+        shifted_f = shifted_f[::-1]
+    if (multipliers == 0).any():
+        raise ValueError("Multiplier must not be zero.")
+
+    n_variants = len(multipliers)
+    if isinstance(out, type(None)):
+        out = np.empty((n_variants, grid.size))
+    # Arguments and values of one component of a chunk of variants.
+    chunk_size = max(int(max_memory // (2 * 8 * max(grid.size, 1))), 1)
+    for start in range(0, n_variants, chunk_size):
+        stop = min(start + chunk_size, n_variants)
+        total = out[start:stop]
+        total[:] = 0
+        for i in range(shifts.shape[1]):
+            x = grid - shifts[start:stop, i, None]
+            x /= multipliers[start:stop, None]
+            values = np.interp(x.ravel(), vv, shifted_f, left=0, right=0)
+            values = values.reshape(x.shape)
+            values *= coefficients[start:stop, i, None]
+            total += values
+    return out
+
+
+def sweep_variants(preset, ranges):
+    # Returns axes (list of (name, values)) and parameters of all variants:
+    # multipliers (n), shifts (n x components), coefficients (n x components).
+    n_components = len(preset["shifts"])
+    names = parameter_names(n_components)
+    unknown = [name for name in ranges if name not in names]
+    if unknown:
+        raise ValueError(f"Unknown sweep parameter(s) {', '.join(unknown)}.")
+
+    base = np.array([preset["multiplier"], *preset["shifts"],
+                     *preset["coefficients"]], dtype=np.float64)
+    axes = [(name, np.asarray(ranges[name], dtype=np.float64))
+            for name in names if name in ranges]
+    indices = [names.index(name) for name, values in axes]
+
+    n_variants = int(np.prod([values.size for name, values in axes]))
+    parameters = np.repeat(base[None, :], n_variants, axis=0)
+    if axes:
+        mesh = np.meshgrid(*[values for name, values in axes], indexing="ij")
+        parameters[:, indices] = np.stack([values.ravel() for values in mesh],
+                                          axis=1)
+    return (axes, parameters[:, 0],
+            parameters[:, 1:1 + n_components],
+            parameters[:, 1 + n_components:])
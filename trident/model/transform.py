@@ -0,0 +1,342 @@
+"""
+Transform is a module with the multiplet transformation engine. It works on
+plain NumPy arrays: the deduplicated union grid of all shifted components
+is built once, every component is interpolated into one preallocated 2-D
+buffer (components x grid) and the buffer is summed along the components axis.
+Development notes:
+    Input singlet grid (VV) is expected to be sorted in ascending order.
+    Computations keep the precision of the input singlet (float32 or float64).
+    Each component occupies a contiguous slice of the sorted grid, so its
+    bounds are stored as (start, stop) indices.
+    Output grids are chosen by `GRID_MODES` (see `output_grid`), engines by
+    `ENGINES` (convolution is in model/convolution.py, total only).
+    `f` can be 2-D (columns x rows): columns share the grid and interpolation
+    indices, components are kept for the first column only.
+    `transform_basis`, `transform_tail` and `interpolate_columns` give results
+    identical to `transform`.
+
+Author: Artem Shepelin
+License: GPLv3
+"""
+
+import numpy as np
+
+from trident.model.convolution import convolution_total
+from trident.model.convolution import is_convolution_suitable
+from trident.model.convolution import uniform_step
+from trident.model.reader import DATA_COLUMNS
+from trident.model.spectrum import Spectrum
+
+
+ENGINES = ["Auto", "Direct", "Convolution"]
+GRID_MODES = ["Union", "Uniform Step", "Uniform Points", "Window"]
+MAX_GRID_POINTS = 100000000
+
+
+def basis_spectrum(grid, basis, multiplier, shifts, coefficients,
+                   preset=None, columns=None):
+    components = np.zeros((len(shifts), grid.size), dtype=grid.dtype)
+    bounds = np.zeros((len(shifts), 2), dtype=np.intp)
+    totals = None
+    for i, (shift, coefficient) in enumerate(zip(shifts, coefficients)):
+        start, stop, row = basis[shift]
+        if row.ndim == 2:
+            if isinstance(totals, type(None)):
+                totals = np.zeros((row.shape[0] - 1, grid.size),
+                                  dtype=grid.dtype)
+            totals[:, start:stop] += row[1:] * grid.dtype.type(coefficient)
+            row = row[0]
+        np.multiply(row, coefficient, out=components[i, start:stop])
+        bounds[i] = (start, stop)
+    return Spectrum(grid, components, bounds, multiplier, shifts,
+                    coefficients, preset, None,
+                    _column_totals(columns, totals))
+
+
+def component_bounds(grid, vv, multiplier, shifts):
+    va = _scale(vv, multiplier)
+    shifts = np.asarray(shifts, dtype=va.dtype)
+    va_min, va_max = sorted([va[0], va[-1]])
+    starts = np.searchsorted(grid, va_min + shifts, side="left")
+    stops = np.searchsorted(grid, va_max + shifts, side="right")
+    return np.stack([starts, stops], axis=1)
+
+
+def interpolate_components(grid, vv, f, multiplier, shifts, coefficients,
+                           bounds):
+    va = _scale(vv, multiplier)
+    shifts = np.asarray(shifts, dtype=va.dtype)
+    components = np.zeros((len(shifts), grid.size), dtype=va.dtype)
+    for i, (shift, coefficient) in enumerate(zip(shifts, coefficients)):
+        start, stop = bounds[i]
+        row = components[i, start:stop]
+        row[:] = np.interp(grid[start:stop] - shift, va, f)
+        row *= coefficient
+    return components
+
+
+def interpolate_columns(grid, vv, f, multiplier, shifts, coefficients,
+                        bounds):
+    # Returns components of the first column of `f` and totals of the other
+    # columns.
+    va = _scale(vv, multiplier)
+    shifts = np.asarray(shifts, dtype=va.dtype)
+    slopes = _slopes(va, f)
+    components = np.zeros((len(shifts), grid.size), dtype=va.dtype)
+    totals = np.zeros((f.shape[0] - 1, grid.size), dtype=va.dtype)
+    for i, (shift, coefficient) in enumerate(zip(shifts, coefficients)):
+        start, stop = bounds[i]
+        values = _interp_columns(grid[start:stop] - shift, va, f, slopes)
+        values = values.astype(va.dtype, copy=False)
+        values *= coefficient
+        components[i, start:stop] = values[0]
+        totals[:, start:stop] += values[1:]
+    return components, totals
+
+
+def is_precision_sufficient(vv, multiplier, shifts, min_ulps=16):
+    # Checks that the finest singlet spacing is resolved by at least
+    # `min_ulps` units in the last place of the grid dtype.
+    va = _scale(vv, multiplier)
+    if va.size < 2:
+        return True
+    magnitude = va.dtype.type(np.max(np.abs(va[[0, -1]])) +
+                              np.max(np.abs(shifts)))
+    spacing = np.min(np.abs(np.diff(va)))
+    return spacing >= min_ulps * np.spacing(magnitude)
+
+
+def output_grid(vv, multiplier, shifts, mode="Union", step=None,
+                n_points=None, window=None):
+    # Uniform grids span the whole multiplet, so their size doesn't depend on
+    # the input length.
+    if mode == "Union":
+        return union_grid(vv, multiplier, shifts)
+    if mode == "Window":
+        return union_grid(vv, multiplier, shifts, window)
+
+    va = _scale(vv, multiplier)
+    va_min, va_max = sorted([float(va[0]), float(va[-1])])
+    start = va_min + min(shifts)
+    stop = va_max + max(shifts)
+    if mode == "Uniform Step":
+        if not step or step <= 0:
+            raise ValueError("Grid step must be positive.")
+        n_points = int((stop - start) // step) + 1
+        _check_grid_size(n_points)
+        grid = start + step * np.arange(n_points)
+        return grid.astype(va.dtype, copy=False)
+    if mode == "Uniform Points":
+        if not n_points or n_points < 2:
+            raise ValueError("Grid must have at least 2 points.")
+        _check_grid_size(n_points)
+        return np.linspace(start, stop, int(n_points), dtype=va.dtype)
+    raise ValueError(f"Unknown grid mode {mode!r}.")
+
+
+def resample_spectrum(spectrum, grid):
+    resample = lambda values: np.interp(grid, spectrum.grid, values, left=0,
+                                        right=0).astype(grid.dtype, copy=False)
+    column_totals = {name: resample(total)
+                     for name, total in spectrum.column_totals.items()}
+    if not len(spectrum.bounds):
+        return Spectrum(grid, np.zeros((0, grid.size), dtype=grid.dtype),
+                        spectrum.bounds, spectrum.multiplier, spectrum.shifts,
+                        spectrum.coefficients, spectrum.preset,
+                        resample(spectrum.total), column_totals)
+
+    components = np.zeros((len(spectrum.shifts), grid.size),
+                          dtype=grid.dtype)
+    bounds = np.zeros_like(spectrum.bounds)
+    for i, (start, stop) in enumerate(spectrum.bounds):
+        if stop <= start:
+            continue
+        x = spectrum.grid[start:stop]
+        bounds[i] = (np.searchsorted(grid, x[0], side="left"),
+                     np.searchsorted(grid, x[-1], side="right"))
+        row = components[i, bounds[i, 0]:bounds[i, 1]]
+        row[:] = np.interp(grid[bounds[i, 0]:bounds[i, 1]], x,
+                           spectrum.components[i, start:stop])
+    return Spectrum(grid, components, bounds, spectrum.multiplier,
+                    spectrum.shifts, spectrum.coefficients, spectrum.preset,
+                    None, column_totals)
+
+
+def stack_columns(data, columns):
+    # Values of one column or a 2-D array (columns x rows) of several ones.
+    if len(columns) == 1:
+        return data[columns[0]]
+    return np.stack([data[column] for column in columns])
+
+
+def transform(vv, f, multiplier, shifts, coefficients, grid=None,
+              engine="Auto"):
+    vv = _as_float(vv)
+    shifted_f = _shift_baseline(f, vv.dtype)
+
+    if isinstance(grid, type(None)):
+        grid = union_grid(vv, multiplier, shifts)
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}.")
+    if (engine == "Convolution" or engine == "Auto" and
+            is_convolution_suitable(grid, len(shifts))):
+        step = uniform_step(grid)
+        if isinstance(step, type(None)):
+            raise ValueError("Convolution engine requires a uniform grid.")
+        total = convolution_total(grid, vv, shifted_f, multiplier, shifts,
+                                  coefficients, step)
+        return (grid, total, np.zeros((0, grid.size), dtype=vv.dtype),
+                np.zeros((0, 2), dtype=np.intp))
+
+    bounds = component_bounds(grid, vv, multiplier, shifts)
+    if shifted_f.ndim == 1:
+        components = interpolate_components(grid, vv, shifted_f, multiplier,
+                                            shifts, coefficients, bounds)
+        return grid, components.sum(axis=0), components, bounds
+    components, totals = interpolate_columns(grid, vv, shifted_f, multiplier,
+                                             shifts, coefficients, bounds)
+    totals = np.concatenate([components.sum(axis=0)[None, :], totals])
+    return grid, totals, components, bounds
+
+
+def transform_tail(vv, shifted_f, multiplier, shifts, coefficients,
+                   old_vv_max):
+    vv = _as_float(vv)
+    va = _scale(vv, multiplier)
+    shifted_f = np.asarray(shifted_f, dtype=vv.dtype)
+    shifts = np.asarray(shifts, dtype=vv.dtype)
+
+    # Grid points at or below the cutoff don't depend on appended rows.
+    cutoff = _scale([old_vv_max], multiplier)[0] + shifts.min()
+    # Singlet rows that are shifted above the cutoff by any component (and
+    # one row before them for interpolation).
+    head = max(int(np.searchsorted(va, cutoff - shifts.max(),
+                                   side="right")) - 1, 0)
+    grid = union_grid(vv[head:], multiplier, shifts)
+    grid = grid[np.searchsorted(grid, cutoff, side="right"):]
+
+    components = np.zeros((len(shifts), grid.size), dtype=vv.dtype)
+    for i, (shift, coefficient) in enumerate(zip(shifts, coefficients)):
+        start = np.searchsorted(grid, va[0] + shift, side="left")
+        stop = np.searchsorted(grid, va[-1] + shift, side="right")
+        row = components[i, start:stop]
+        row[:] = np.interp(grid[start:stop] - shift, va[head:],
+                           shifted_f[head:])
+        row *= coefficient
+    return cutoff, grid, components
+
+
+def transform_basis(vv, f, multiplier, shifts, grid, basis=None):
+    # Basis is {shift: (start, stop, row)} of unit coefficient components
+    # (see `basis_spectrum`). Rows of shifts that are in `basis` (built on
+    # the same grid) are reused.
+    vv = _as_float(vv)
+    shifted_f = _shift_baseline(f, vv.dtype)
+    va = _scale(vv, multiplier)
+    if shifted_f.ndim == 2:
+        slopes = _slopes(va, shifted_f)
+
+    bounds = component_bounds(grid, vv, multiplier, shifts)
+    rows = {}
+    for shift, (start, stop) in zip(shifts, bounds):
+        if shift in rows:
+            continue
+        if not isinstance(basis, type(None)) and shift in basis:
+            rows[shift] = basis[shift]
+            continue
+        x = grid[start:stop] - va.dtype.type(shift)
+        if shifted_f.ndim == 2:
+            row = _interp_columns(x, va, shifted_f, slopes)
+        else:
+            row = np.interp(x, va, shifted_f)
+        rows[shift] = (start, stop, row.astype(va.dtype, copy=False))
+    return rows
+
+
+def transform_spectrum(vv, f, multiplier, shifts, coefficients, preset=None,
+                       grid=None, engine="Auto", columns=None):
+    grid, total, components, bounds = transform(vv, f, multiplier, shifts,
+                                                coefficients, grid, engine)
+    totals = None
+    if total.ndim == 2:
+        total, totals = total[0], total[1:]
+    return Spectrum(grid, components, bounds, multiplier, shifts,
+                    coefficients, preset, total,
+                    _column_totals(columns, totals))
+
+
+def union_grid(vv, multiplier, shifts, window=None):
+    va = _scale(vv, multiplier)
+    shifts = np.asarray(shifts, dtype=va.dtype)
+    if isinstance(window, type(None)):
+        return np.unique(np.concatenate([va + shift for shift in shifts]))
+
+    x_min, x_max = window
+    if va.size > 1 and va[0] > va[-1]:
+        va = va[::-1]
+    parts = []
+    for shift in shifts:
+        start = np.searchsorted(va, x_min - shift, side="left")
+        stop = np.searchsorted(va, x_max - shift, side="right")
+        parts.append(va[start:stop] + shift)
+    return np.unique(np.concatenate(parts))
+
+
+def _as_float(values):
+    # Single precision arrays are kept as is, anything else is float64.
+    values = np.asarray(values)
+    if values.dtype == np.float32:
+        return values
+    return values.astype(np.float64, copy=False)
+
+
+def _check_grid_size(n_points):
+    if n_points > MAX_GRID_POINTS:
+        raise ValueError(f"Uniform grid would have {n_points} points, the "
+                         f"maximum is {MAX_GRID_POINTS}. Use a larger grid "
+                         f"step or fewer points.")
+
+
+def _column_totals(columns, totals):
+    # Names totals of columns after the first one.
+    if isinstance(totals, type(None)):
+        return {}
+    if isinstance(columns, type(None)):
+        columns = DATA_COLUMNS
+    return dict(zip(columns[1:], totals))
+
+
+def _interp_columns(x, xp, fp, slopes):
+    # `np.interp` of every row of `fp` with shared indices (same arithmetic
+    # as `np.interp`, so results are identical).
+    x = np.asarray(x, dtype=np.float64)
+    xp = np.asarray(xp, dtype=np.float64)
+    if xp.size < 2:
+        return np.stack([np.interp(x, xp, row) for row in fp])
+    indices = np.searchsorted(xp, x, side="right") - 1
+    np.clip(indices, 0, xp.size - 2, out=indices)
+    values = slopes[:, indices] * (x - xp[indices]) + fp[:, indices]
+    values[:, x < xp[0]] = fp[:, :1]
+    values[:, x >= xp[-1]] = fp[:, -1:]
+    return values
+
+
+def _scale(vv, multiplier):
+    vv = _as_float(vv)
+    return vv * vv.dtype.type(multiplier)
+
+
+def _shift_baseline(f, dtype):
+    # Subtracts minimum of each column.
+    f = np.asarray(f, dtype=dtype)
+    return f - np.min(f, axis=-1, keepdims=True)
+
+
+def _slopes(va, f):
+    va = np.asarray(va, dtype=np.float64)
+    f = np.asarray(f, dtype=np.float64)
+    # Duplicate VV values give zero length segments, they are never used.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slopes = np.diff(f, axis=1) / np.diff(va)
+    slopes[~np.isfinite(slopes)] = 0
+    return slopes
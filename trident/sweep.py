@@ -0,0 +1,114 @@
+"""
+Sweep is a module with command line interface for parameter sweeps of a lines
+preset (see model/sweep.py). All combinations of swept parameter values are
+transformed onto a common uniform grid, stacked totals are written to a NumPy
+archive and rendered as a heat map.
+Usage:
+    trident sweep Absorption.dat --preset "He II (2S3 > 2P3)"
+        --sweep shift_3=2:4:21 multiplier=9:9.2:5 --grid-points 10000
+    Range format is "start:stop:number of values" (both ends included) or a
+    single value.
+    Output archive (.npz) contains "grid", "totals" with shape
+    (*axes sizes, grid size), "axes" (names of swept parameters) and one array
+    of values per swept parameter.
+
+Author: Artem Shepelin
+License: GPLv3
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from trident.model.model import Model
+from trident.model.reader import read_absorption
+from trident.model.sweep import MAX_MEMORY
+from trident.model.sweep import sweep_grid
+from trident.model.sweep import sweep_totals
+from trident.model.sweep import sweep_variants
+from trident.utils.renderer import render_sweep
+
+
+def main(argv=None):
+    parser = _make_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        ranges = dict(_parse_range(text) for text in args.sweep)
+        preset = Model().lines_presets[args.preset]
+        axes, multipliers, shifts, coefficients = sweep_variants(preset,
+                                                                 ranges)
+        raw_data = read_absorption(args.input)
+        grid = sweep_grid(raw_data["VV"], multipliers, shifts,
+                          args.grid_points, args.grid_step)
+        print(f"Evaluating {len(multipliers)} variants on {grid.size} grid "
+              f"points.", file=sys.stderr)
+        totals = sweep_totals(raw_data["VV"], raw_data["FullAbs"], grid,
+                              multipliers, shifts, coefficients,
+                              args.memory * 1024 ** 2)
+    except (OSError, ValueError) as e:
+        print(f"{type(e).__name__}: {e}", file=sys.stderr)
+        return 1
+
+    output_head = os.path.splitext(args.input)[0] + "_sweep"
+    output_file = args.output if args.output else f"{output_head}.npz"
+    shape = [values.size for name, values in axes]
+    np.savez(output_file, grid=grid, totals=totals.reshape(*shape, grid.size),
+             axes=np.array([name for name, values in axes], dtype=str),
+             **dict(axes))
+    print(f"{args.input} -> {output_file}", file=sys.stderr)
+
+    if args.figure != "none":
+        figure_file = args.figure if args.figure else f"{output_head}.png"
+        render_sweep(grid, totals, axes, args.preset).savefig(figure_file)
+        print(f"{args.input} -> {figure_file}", file=sys.stderr)
+    return 0
+
+
+def _make_parser():
+    model = Model()
+    parser = argparse.ArgumentParser(
+        prog="trident sweep",
+        description="Transform a file with all combinations of lines preset "
+                    "parameter values.")
+    parser.add_argument("input", help="input file")
+    parser.add_argument(
+        "-p", "--preset", default=model.lines_preset.value,
+        choices=list(model.lines_presets.keys()), help="base lines preset")
+    parser.add_argument(
+        "-s", "--sweep", nargs="*", default=[],
+        help="swept parameters as name=start:stop:number (names: multiplier, "
+             "shift_<n>, coefficient_<n>, n is a component number from 1)")
+    grid = parser.add_mutually_exclusive_group()
+    grid.add_argument(
+        "--grid-points", type=int, default=10000,
+        help="number of points of the common uniform grid")
+    grid.add_argument(
+        "--grid-step", type=float, default=None,
+        help="step of the common uniform grid")
+    parser.add_argument(
+        "-m", "--memory", type=int, default=MAX_MEMORY // 1024 ** 2,
+        help="memory budget of intermediate arrays (MiB)")
+    parser.add_argument(
+        "-o", "--output", default=None,
+        help="output archive (by default <input>_sweep.npz)")
+    parser.add_argument(
+        "-f", "--figure", default=None,
+        help="heat map figure (by default <input>_sweep.png, \"none\" to "
+             "skip)")
+    return parser
+
+
+def _parse_range(text):
+    name, separator, values = text.partition("=")
+    if not separator:
+        raise ValueError(f"Invalid sweep {text!r}, expected name=values.")
+    parts = values.split(":")
+    if len(parts) == 1:
+        return name, np.array([float(parts[0])])
+    if len(parts) != 3:
+        raise ValueError(f"Invalid range {values!r}, expected "
+                         f"start:stop:number.")
+    return name, np.linspace(float(parts[0]), float(parts[1]), int(parts[2]))
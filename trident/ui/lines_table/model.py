@@ -1,27 +1,49 @@
 """
 Table Model for work with absorption lines configuration.
+Development notes:
+    Shifts and coefficients are editable. Edited values are not written to the
+    preset by the table: `valueEdited` (column name, value, row) is emitted
+    and the preset is changed by the application model (see
+    `Model.edit_preset`).
 
 Author: Artem Shepelin
 License: GPLv3
 """
 
+from PyQt6.QtCore import pyqtSignal
 from PyQt6.QtCore import QAbstractTableModel
 from PyQt6.QtCore import Qt
 DisplayRole = Qt.ItemDataRole.DisplayRole
+EditRole = Qt.ItemDataRole.EditRole
 Horizontal = Qt.Orientation.Horizontal
+ItemIsEditable = Qt.ItemFlag.ItemIsEditable
+
+
+COLUMNS = ["shifts", "coefficients"]
 
 
 class LinesTableModel(QAbstractTableModel):
-    def __init__(self, preset):
-        super().__init__()
+    valueEdited = pyqtSignal(str, float, int)
+
+
+    def __init__(self, preset, parent=None):
+        super().__init__(parent)
 
         self._preset = preset
 
 
     def data(self, index, role):
         if role == DisplayRole:
-            column = ["shifts", "coefficients"][index.column()]
+            column = COLUMNS[index.column()]
             return self._preset[column][index.row()]
+        if role == EditRole:
+            # Text editor keeps full precision (spin box editors round).
+            column = COLUMNS[index.column()]
+            return str(self._preset[column][index.row()])
+
+
+    def flags(self, index):
+        return super().flags(index) | ItemIsEditable
 
 
     def headerData(self, section, orientation, role):
@@ -38,4 +60,17 @@ class LinesTableModel(QAbstractTableModel):
 
 
     def columnCount(self, index):
-        return 2
\ No newline at end of file
+        return 2
+
+
+    def setData(self, index, value, role=EditRole):
+        if role != EditRole:
+            return False
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return False
+        self.dataChanged.emit(index, index)
+        # Last: editing a built-in preset replaces this model (see presenter).
+        self.valueEdited.emit(COLUMNS[index.column()], value, index.row())
+        return True
@@ -1,5 +1,27 @@
 """
 PlotWidget View is a view class for Matplotlib plot widget.
+Development notes:
+    Line artists are persistent: data changes update existing `Line2D` objects
+    with `set_data` (creating or removing lines only when the number of series
+    changes) and each setter restyles only the affected artists. All redraws
+    are requested with `draw_idle`, so a burst of changes results in a single
+    canvas draw.
+    Lines show a min/max decimated level of detail of the visible window
+    (see utils/decimation.py), recomputed lazily on the next draw after data
+    or X limits change.
+    The canvas is a screen preview: it always renders at screen resolution
+    (`dpi` keyword of the constructor), figure size changes resize the
+    existing figure in place. Exports are rendered offscreen at the requested
+    DPI from a model snapshot (see utils/renderer.py), so export DPI doesn't
+    affect the canvas at all.
+    Progressive rendering: if limits or figure size change again after a draw
+    and before `preview_delay` (ms) has passed since the previous change (e.g.
+    a spin box is being dragged), lines are drawn as a cheap stride decimated preview
+    without antialiasing, and one full quality draw is made after the changes
+    have been idle for `preview_delay`. Single changes are drawn at full
+    quality right away.
+    Overlays (spectra of other files) are drawn as thin total lines after the
+    lines of the main data.
 
 Author: Artem Shepelin
 License: GPLv3
@@ -10,6 +32,14 @@ mpl.use("QtAgg")
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import numpy as np
+from PyQt6.QtCore import QTimer
+
+from trident.utils.decimation import min_max_decimate
+from trident.utils.decimation import stride_decimate
+
+
+PREVIEW_DELAY = 300 # ms
+PREVIEW_RESOLUTION = 0.5 # points per pixel column
 
 
 class PlotWidget(FigureCanvas):
@@ -23,6 +53,9 @@ class PlotWidget(FigureCanvas):
         self._figure_y = 4
         if "figure_y" in kwargs.keys():
             self._figure_y = kwargs["figure_y"]
+        preview_delay = PREVIEW_DELAY
+        if "preview_delay" in kwargs.keys():
+            preview_delay = kwargs["preview_delay"]
 
         self.figure = Figure(figsize=(self._figure_x, self._figure_y),
                              dpi=self._dpi)
@@ -38,12 +71,24 @@ class PlotWidget(FigureCanvas):
         self.setFixedSize(int(self._dpi * self._figure_x),
                           int(self._dpi * self._figure_y))
 
+        self._is_drawn = False
+        self._is_image_outdated = False
+        self._is_preview = False
+        self._lines = []
+
+        self._preview_timer = QTimer(self)
+        self._preview_timer.setSingleShot(True)
+        self._preview_timer.setInterval(preview_delay)
+        self._preview_timer.timeout.connect(self._finish_preview)
+
         self._axes_color = None
         self._axes_labels_color = None
         self._background_color = None
         self._data = None
         self._is_background_transparent = None
         self._is_show_intermediate_lines = None
+        self._overlays = ()
+        self._plot_column = None
         self._ticks_color = None
         self._title = None
         self._title_color = None
@@ -55,70 +100,90 @@ class PlotWidget(FigureCanvas):
         self._y_min = None
 
 
+    def draw(self):
+        if self._is_image_outdated:
+            self._draw_image()
+        super().draw()
+        self._is_drawn = True
+
+
     def setAxesColor(self, axes_color):
         if self._axes_color != axes_color:
             self._axes_color = axes_color
             self._draw_axes_color()
-            self.draw()
+            self.draw_idle()
 
 
     def setAxesLabelsColor(self, axes_labels_color):
         if self._axes_labels_color != axes_labels_color:
             self._axes_labels_color = axes_labels_color
             self._draw_axes_labels_color()
-            self.draw()
+            self.draw_idle()
 
 
     def setBackgroundColor(self, background_color):
         if self._background_color != background_color:
             self._background_color = background_color
             self._draw_background()
-            self.draw()
+            self.draw_idle()
 
 
     def setData(self, data):
         self._data = data
-        self._clear()
-        self._draw_full()
-
-
-    def setDpi(self, dpi):
-        if self._dpi != dpi:
-            self._dpi = dpi
-            self._reset()
+        self._is_image_outdated = True
+        self.draw_idle()
 
 
     def setFigureX(self, figure_x):
         if self._figure_x != figure_x:
             self._figure_x = figure_x
-            self._reset()
+            self._request_preview()
+            self._resize()
 
 
     def setFigureY(self, figure_y):
         if self._figure_y != figure_y:
             self._figure_y = figure_y
-            self._reset()
+            self._request_preview()
+            self._resize()
 
 
     def setIsBackgroundTransparent(self, is_background_transparent):
         if self._is_background_transparent != is_background_transparent:
             self._is_background_transparent = is_background_transparent
             self._draw_background()
-            self.draw()
+            self.draw_idle()
 
 
     def setIsShowIntermediateLines(self, is_show_intermediate_lines):
         if self._is_show_intermediate_lines != is_show_intermediate_lines:
             self._is_show_intermediate_lines = is_show_intermediate_lines
-            self._clear()
-            self._draw_full()
+            self._is_image_outdated = True
+            self.draw_idle()
+
+
+    def setOverlays(self, overlays):
+        self._overlays = overlays
+        self._is_image_outdated = True
+        self.draw_idle()
+
+
+    def setPlotColumn(self, plot_column):
+        if self._plot_column != plot_column:
+            self._plot_column = plot_column
+            self._is_image_outdated = True
+            self.draw_idle()
+
+
+    def setPreviewDelay(self, preview_delay):
+        self._preview_timer.setInterval(preview_delay)
 
 
     def setTicksColor(self, ticks_color):
         if self._ticks_color != ticks_color:
             self._ticks_color = ticks_color
             self._draw_ticks_color()
-            self.draw()
+            self.draw_idle()
 
 
     def setTitle(self, title):
@@ -126,7 +191,7 @@ class PlotWidget(FigureCanvas):
             self._title = title
             try:
                 self._draw_title()
-                self.draw()
+                self.draw_idle()
             except:
                 pass
 
@@ -135,7 +200,7 @@ class PlotWidget(FigureCanvas):
         if self._title_color != title_color:
             self._title_color = title_color
             self._draw_title_color()
-            self.draw()
+            self.draw_idle()
 
 
     def setXAxisName(self, x_axis_name):
@@ -143,7 +208,7 @@ class PlotWidget(FigureCanvas):
             self._x_axis_name = x_axis_name
             try:
                 self._draw_x_axis_name()
-                self.draw()
+                self.draw_idle()
             except:
                 pass
 
@@ -151,15 +216,19 @@ class PlotWidget(FigureCanvas):
     def setXMax(self, x_max):
         if self._x_max != x_max:
             self._x_max = x_max
+            self._request_preview()
             self._draw_x_limits()
-            self.draw()
+            self._is_image_outdated = True
+            self.draw_idle()
 
 
     def setXMin(self, x_min):
         if self._x_min != x_min:
             self._x_min = x_min
+            self._request_preview()
             self._draw_x_limits()
-            self.draw()
+            self._is_image_outdated = True
+            self.draw_idle()
 
 
     def setYAxisName(self, y_axis_name):
@@ -167,7 +236,7 @@ class PlotWidget(FigureCanvas):
             self._y_axis_name = y_axis_name
             try:
                 self._draw_y_axis_name()
-                self.draw()
+                self.draw_idle()
             except:
                 pass
 
@@ -175,19 +244,17 @@ class PlotWidget(FigureCanvas):
     def setYMax(self, y_max):
         if self._y_max != y_max:
             self._y_max = y_max
+            self._request_preview()
             self._draw_y_limits()
-            self.draw()
+            self.draw_idle()
 
 
     def setYMin(self, y_min):
         if self._y_min != y_min:
             self._y_min = y_min
+            self._request_preview()
             self._draw_y_limits()
-            self.draw()
-
-
-    def _clear(self):
-        self.ax.clear()
+            self.draw_idle()
 
 
     def _draw_axes_color(self):
@@ -213,35 +280,38 @@ class PlotWidget(FigureCanvas):
             self.ax.patch.set_alpha(1)
 
 
-    def _draw_full(self):
-        self._draw_axes_color()
-        self._draw_axes_labels_color()
-        self._draw_background()
-        self._draw_image()
-        self._draw_ticks_color()
-        self._draw_title()
-        self._draw_title_color()
-        self._draw_x_axis_name()
-        self._draw_x_limits()
-        self._draw_y_axis_name()
-        self._draw_y_limits()
-        self.draw()
-
-
     def _draw_image(self):
         # colors = ["#6c81ff", "#fffc6c", "#ff836c", "#88ff6c"]
         # colors = ["#00bcff", "#ffd300", "#ff2700", "#81ff00"]
         colors = ["#0EA5FF", "#FF3D00", "#00FF7D", "#FF8C00"]
+        lines = []
         if not isinstance(self._data, type(None)):
-            linewidth = 2
-            if not self._is_show_intermediate_lines:
-                self.ax.plot(self._data.index, self._data["F"],
-                             color=colors[0], linewidth=linewidth)
+            lines = self._data.lines(self._is_show_intermediate_lines,
+                                     self._plot_column)
+        n_main = len(lines)
+        lines += [overlay.lines(column=self._plot_column)[0]
+                  for overlay in self._overlays]
+        width = self.figure.bbox.width * self.ax.get_position().width
+
+        while len(self._lines) > len(lines):
+            self._lines.pop().remove()
+        for i, (x, y) in enumerate(lines):
+            if self._is_preview:
+                x, y = stride_decimate(x, y, self._x_min, self._x_max,
+                                       PREVIEW_RESOLUTION * width)
             else:
-                for i, key in enumerate(self._data.keys()):
-                    self.ax.plot(self._data.index, self._data[key],
-                                 color=colors[i % len(colors)],
-                                 linewidth=linewidth)
+                x, y = min_max_decimate(x, y, self._x_min, self._x_max,
+                                        2 * width)
+            if i < len(self._lines):
+                self._lines[i].set_data(x, y)
+            else:
+                self._lines.extend(self.ax.plot(x, y))
+            self._lines[i].set_color(colors[i % len(colors)])
+            self._lines[i].set_linewidth(2 if i < n_main else 1)
+            self._lines[i].set_antialiased(not self._is_preview)
+        self._draw_x_limits()
+        self._draw_y_limits()
+        self._is_image_outdated = False
 
 
     def _draw_ticks_color(self):
@@ -276,16 +346,27 @@ class PlotWidget(FigureCanvas):
         self.ax.set_ylim([self._y_min, self._y_max])
 
 
-    def _reset(self):
-        self.figure = Figure(figsize=(self._figure_x, self._figure_y),
-                             dpi=self._dpi)
-        self.ax = self.figure.add_subplot(1, 1, 1)
+    def _finish_preview(self):
+        if self._is_preview:
+            self._is_preview = False
+            self._is_image_outdated = True
+            self.draw_idle()
+
+
+    def _request_preview(self):
+        # Changes made before the canvas is drawn are a single change.
+        if self._preview_timer.isActive() and self._is_drawn:
+            if not self._is_preview:
+                self._is_preview = True
+                self._is_image_outdated = True
+        self._is_drawn = False
+        self._preview_timer.start()
 
-        self.ax.spines['top'].set_visible(False)
-        self.ax.spines['bottom'].set_visible(False)
-        self.ax.spines['left'].set_visible(False)
-        self.ax.spines['right'].set_visible(False)
 
+    def _resize(self):
+        self.figure.set_size_inches(self._figure_x, self._figure_y,
+                                    forward=False)
         self.setFixedSize(int(self._dpi * self._figure_x),
                           int(self._dpi * self._figure_y))
-        self._draw_full()
\ No newline at end of file
+        self._is_image_outdated = True
+        self.draw_idle()
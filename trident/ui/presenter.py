@@ -11,6 +11,7 @@ Development notes:
     `MainWindowPresenter._bind_model_to_view` function.
     4) You can add actions (for menus and etc.).
     5) You can add additional validators and helper data transformer methods.
+    Watched input file is polled by `_watch_timer` (see `Model.reload`).
 
 Author: Artem Shepelin
 License: GPLv3
@@ -18,20 +19,29 @@ License: GPLv3
 
 import os
 
+from PyQt6.QtCore import QTimer
 from PyQt6.QtWidgets import QFileDialog
 from PyQt6.QtWidgets import QErrorMessage
 from PyQt6.QtWidgets import QFileDialog
 from PyQt6.QtWidgets import QMessageBox
 AcceptSave = QFileDialog.AcceptMode.AcceptSave
 
+from trident.model import export
+from trident.model.export import ExportError
+from trident.model.reader import FileFormatError
 from trident.ui.lines_table.model import LinesTableModel
 from trident.__init__ import __version__
 
 
+WATCH_INTERVAL = 1000 # ms
+
+
 class MainWindowPresenter:
     def __init__(self, model, view):
         self.model = model
         self.view = view
+        self._watch_timer = QTimer(self.view)
+        self._watch_timer.setInterval(WATCH_INTERVAL)
 
         self._set_view_initial_values()
         self._bind_model_to_view()
@@ -49,6 +59,31 @@ class MainWindowPresenter:
             "Repository: https://github.com/deverte/trident")
 
 
+    def _action_add_overlays(self):
+        file_names = QFileDialog.getOpenFileNames(
+            self.view, "Add Overlays", "",
+            "Data Files (*.dat);;All Files (*.*)")[0]
+        if file_names:
+            overlay_files = list(self.model.overlay_files.value)
+            overlay_files += [file_name for file_name in file_names
+                              if file_name not in overlay_files]
+            try:
+                self.model.overlay_files = overlay_files
+            except Exception as e:
+                self._show_error(e)
+
+
+    def _action_fit_preset(self):
+        file_name = QFileDialog.getOpenFileName(
+            self.view, "Open Observed Multiplet", "",
+            "Data Files (*.dat *.csv);;All Files (*.*)")[0]
+        if file_name:
+            try:
+                self.model.fit_preset(file_name)
+            except Exception as e:
+                self._show_error(e)
+
+
     def _action_open_as(self):
         try:
             file_name = QFileDialog.getOpenFileName(
@@ -59,6 +94,10 @@ class MainWindowPresenter:
         except FileNotFoundError:
             QErrorMessage(self.view).showMessage(
                 f"File {self.model.input_file.value} does not exist.")
+        except FileFormatError as e:
+            QErrorMessage(self.view).showMessage(
+                f"File {self.model.input_file.value} has an incompatible format. "
+                f"{e}")
         except Exception:
             QErrorMessage(self.view).showMessage(
                 f"File {self.model.input_file.value} has an incompatible format.")
@@ -70,6 +109,10 @@ class MainWindowPresenter:
         except FileNotFoundError:
             QErrorMessage(self.view).showMessage(
                 f"File {self.model.input_file.value} does not exist.")
+        except FileFormatError as e:
+            QErrorMessage(self.view).showMessage(
+                f"File {self.model.input_file.value} has an incompatible format. "
+                f"{e}")
         except Exception:
             QErrorMessage(self.view).showMessage(
                 f"File {self.model.input_file.value} has an incompatible format.")
@@ -81,7 +124,7 @@ class MainWindowPresenter:
             return
         ftypes = [f"{val} (*.{key})" for key, val
                   in [*self.view.plotPlotWidget.get_supported_filetypes().items(),
-                      ["csv", "Comma Separated Values"]]]
+                      *export.data_formats().items()]]
         save_file_dialog = QFileDialog(self.view)
         file_path = os.path.split(self.model.input_file.value)[0]
         if os.path.exists(file_path):
@@ -101,8 +144,7 @@ class MainWindowPresenter:
                 file_name = f"{file_name}{file_ext}"
             if file_name:
                 try:
-                    self.model.data_write(file_name,
-                                          self.view.plotPlotWidget.figure)
+                    self.model.data_write(file_name)
                 except:
                     QErrorMessage(self.view).showMessage(
                         f"Can't save file {file_name}.")
@@ -122,8 +164,7 @@ class MainWindowPresenter:
                 f"Please, configure output file name.")
             return
         try:
-            self.model.data_write(self.model.output_file.value,
-                                  self.view.plotPlotWidget.figure)
+            self.model.data_write(self.model.output_file.value)
         except:
             QErrorMessage(self.view).showMessage(
                 f"Can't save file {self.model.output_file.value}.")
@@ -134,34 +175,63 @@ class MainWindowPresenter:
         self.model.axes_labels_color.changed.connect(self.view.plotPlotWidget.setAxesLabelsColor)
         self.model.background_color.changed.connect(self.view.plotPlotWidget.setBackgroundColor)
         self.model.data.changed.connect(self.view.plotPlotWidget.setData)
-        self.model.dpi.changed.connect(self.view.plotPlotWidget.setDpi)
         self.model.figure_x.changed.connect(self.view.plotPlotWidget.setFigureX)
         self.model.figure_y.changed.connect(self.view.plotPlotWidget.setFigureY)
+        self.model.fit_result.changed.connect(self._show_fit_result)
+        self.model.error.changed.connect(self._show_error)
+        self.model.broadening_fwhm.changed.connect(lambda value: set_value_silently(self.view.broadeningFwhmDoubleSpinBox, value))
+        self.model.broadening_profile.changed.connect(lambda value: self.view.broadeningProfileComboBox.setCurrentText(value))
+        self.model.broadening_profile.changed.connect(self._show_broadening_options)
+        self.model.grid_mode.changed.connect(lambda value: self.view.gridModeComboBox.setCurrentText(value))
+        self.model.grid_mode.changed.connect(self._show_grid_options)
+        self.model.grid_points.changed.connect(lambda value: set_value_silently(self.view.gridPointsSpinBox, value))
+        self.model.grid_step.changed.connect(lambda value: set_value_silently(self.view.gridStepDoubleSpinBox, value))
+        self.model.export_progress.changed.connect(self._show_export_progress)
         self.model.input_file.changed.connect(self.view.inputFileFileLineEdit.setText)
+        self.model.is_all_columns.changed.connect(self.view.actionAll_Columns.setChecked)
+        self.model.is_all_columns.changed.connect(self.view.plotColumnComboBox.setEnabled)
+        self.model.is_busy.changed.connect(self.view.busyProgressBar.setVisible)
+        self.model.is_common_grid.changed.connect(self.view.actionCommon_Grid.setChecked)
+        self.model.is_data_cache_enabled.changed.connect(self.view.actionCache_Parsed_Data.setChecked)
         self.model.is_show_intermediate_lines.changed.connect(self.view.plotPlotWidget.setIsShowIntermediateLines)
+        self.model.is_single_precision.changed.connect(self.view.actionSingle_Precision.setChecked)
         self.model.is_transparent_background.changed.connect(self.view.plotPlotWidget.setIsBackgroundTransparent)
+        self.model.is_watch_enabled.changed.connect(self.view.isWatchEnabledCheckBox.setChecked)
+        self.model.is_watch_enabled.changed.connect(self._set_watch_timer_active)
         self.model.output_file.changed.connect(self.view.outputFileLineEdit.setText)
+        self.model.overlays.changed.connect(self.view.plotPlotWidget.setOverlays)
+        self.model.plot_column.changed.connect(lambda value: self.view.plotColumnComboBox.setCurrentText(value))
+        self.model.plot_column.changed.connect(self.view.plotPlotWidget.setPlotColumn)
         self.model.ticks_color.changed.connect(self.view.plotPlotWidget.setTicksColor)
         self.model.title.changed.connect(self.view.plotPlotWidget.setTitle)
         self.model.title_color.changed.connect(self.view.plotPlotWidget.setTitleColor)
+        self.model.warning.changed.connect(self._show_warning)
         self.model.x_axis_name.changed.connect(self.view.plotPlotWidget.setXAxisName)
         self.model.x_max.changed.connect(self.view.plotPlotWidget.setXMax)
-        self.model.x_max.changed.connect(self.view.xMaxDoubleSpinBox.setValue)
+        self.model.x_max.changed.connect(lambda value: set_value_silently(self.view.xMaxDoubleSpinBox, value))
         self.model.x_min.changed.connect(self.view.plotPlotWidget.setXMin)
-        self.model.x_min.changed.connect(self.view.xMinDoubleSpinBox.setValue)
+        self.model.x_min.changed.connect(lambda value: set_value_silently(self.view.xMinDoubleSpinBox, value))
         self.model.y_axis_name.changed.connect(self.view.plotPlotWidget.setYAxisName)
         self.model.y_max.changed.connect(self.view.plotPlotWidget.setYMax)
-        self.model.y_max.changed.connect(self.view.yMaxDoubleSpinBox.setValue)
+        self.model.y_max.changed.connect(lambda value: set_value_silently(self.view.yMaxDoubleSpinBox, value))
         self.model.y_min.changed.connect(self.view.plotPlotWidget.setYMin)
-        self.model.y_min.changed.connect(self.view.yMinDoubleSpinBox.setValue)
-        self.model.lines_preset.changed.connect(lambda : self.view.linesConfigurationTableView.setModel(LinesTableModel(self.model.lines_presets[self.model.lines_preset.value])))
+        self.model.y_min.changed.connect(lambda value: set_value_silently(self.view.yMinDoubleSpinBox, value))
+        self.model.lines_preset.changed.connect(lambda value: self.view.linesPresetComboBox.setCurrentText(value))
+        self.model.lines_preset.changed.connect(self._show_lines_preset)
 
 
     def _bind_view_to_model(self):
         self.view.actionAbout.triggered.connect(self._action_about)
+        self.view.actionAdd_Overlays.triggered.connect(self._action_add_overlays)
+        self.view.actionAll_Columns.toggled.connect(self.model.is_all_columns.setValue)
+        self.view.actionCache_Parsed_Data.toggled.connect(self.model.is_data_cache_enabled.setValue)
+        self.view.actionClear_Overlays.triggered.connect(lambda : self.model.overlay_files.setValue(()))
+        self.view.actionCommon_Grid.toggled.connect(self.model.is_common_grid.setValue)
+        self.view.actionFit_Preset.triggered.connect(self._action_fit_preset)
         self.view.actionOpen.triggered.connect(self._action_open_as)
         self.view.actionQuit.triggered.connect(lambda : sys.exit())
         self.view.actionSave.triggered.connect(self._action_save)
+        self.view.actionSingle_Precision.toggled.connect(self.model.is_single_precision.setValue)
         self.view.actionSave_As.triggered.connect(self._action_save_as)
         self.view.axesColorColorButton.colorChanged.connect(self.model.axes_color.setValue)
         self.view.axesLabelsColorColorButton.colorChanged.connect(self.model.axes_labels_color.setValue)
@@ -169,47 +239,83 @@ class MainWindowPresenter:
         self.view.dpiSpinBox.valueChanged.connect(self.model.dpi.setValue)
         self.view.figureXDoubleSpinBox.valueChanged.connect(self.model.figure_x.setValue)
         self.view.figureYDoubleSpinBox.valueChanged.connect(self.model.figure_y.setValue)
+        self.view.broadeningFwhmDoubleSpinBox.valueChanged.connect(self.model.broadening_fwhm.setValue)
+        self.view.broadeningProfileComboBox.currentTextChanged.connect(self.model.broadening_profile.setValue)
+        self.view.gridModeComboBox.currentTextChanged.connect(self.model.grid_mode.setValue)
+        self.view.gridPointsSpinBox.valueChanged.connect(self.model.grid_points.setValue)
+        self.view.gridStepDoubleSpinBox.valueChanged.connect(self.model.grid_step.setValue)
         self.view.inputFileFileLineEdit.dropped.connect(self.model.input_file.setValue)
         self.view.inputFileFileLineEdit.editingFinished.connect(lambda : self.model.input_file.setValue(self.view.inputFileFileLineEdit.text()))
         self.view.isShowIntermediateLinesCheckBox.stateChanged.connect(self.model.is_show_intermediate_lines.setValue)
         self.view.isTransparentBackgroundCheckBox.stateChanged.connect(self.model.is_transparent_background.setValue)
+        self.view.isWatchEnabledCheckBox.toggled.connect(self.model.is_watch_enabled.setValue)
         self.view.linesPresetComboBox.currentTextChanged.connect(self.model.lines_preset.setValue)
+        self.view.multiplierDoubleSpinBox.valueChanged.connect(lambda value: self.model.edit_preset("multiplier", value))
         self.view.openAsPushButton.pressed.connect(self._action_open_as)
         self.view.openPushButton.pressed.connect(self._action_open)
         self.view.outputFileLineEdit.editingFinished.connect(lambda : self.model.output_file.setValue(self.view.outputFileLineEdit.text()))
+        self.view.plotColumnComboBox.currentTextChanged.connect(self.model.plot_column.setValue)
         self.view.saveAsPushButton.pressed.connect(self._action_save_as)
         self.view.savePushButton.pressed.connect(self._action_save)
         self.view.ticksColorColorButton.colorChanged.connect(self.model.ticks_color.setValue)
+        self._watch_timer.timeout.connect(self._reload)
         self.view.titleLineEdit.textChanged.connect(self.model.title.setValue)
         self.view.titleColorColorButton.colorChanged.connect(self.model.title_color.setValue)
         self.view.xAxisNameLineEdit.textChanged.connect(self.model.x_axis_name.setValue)
-        self.view.xMaxDoubleSpinBox.valueChanged.connect(self.model.x_max.setValue)
-        self.view.xMinDoubleSpinBox.valueChanged.connect(self.model.x_min.setValue)
+        self.view.xMaxDoubleSpinBox.valueChanged.connect(lambda value: self.model.edit_limit("x_max", value))
+        self.view.xMinDoubleSpinBox.valueChanged.connect(lambda value: self.model.edit_limit("x_min", value))
         self.view.yAxisNameLineEdit.textChanged.connect(self.model.y_axis_name.setValue)
-        self.view.yMaxDoubleSpinBox.valueChanged.connect(self.model.y_max.setValue)
-        self.view.yMinDoubleSpinBox.valueChanged.connect(self.model.y_min.setValue)
+        self.view.yMaxDoubleSpinBox.valueChanged.connect(lambda value: self.model.edit_limit("y_max", value))
+        self.view.yMinDoubleSpinBox.valueChanged.connect(lambda value: self.model.edit_limit("y_min", value))
+
+
+    def _reload(self):
+        try:
+            self.model.reload()
+        except Exception as e:
+            self.model.is_watch_enabled = False
+            self._show_error(e)
 
 
     def _set_view_initial_values(self):
+        self.view.busyProgressBar.setVisible(self.model.is_busy.value)
+        self._show_export_progress(self.model.export_progress.value)
+        self.view.actionAll_Columns.setChecked(self.model.is_all_columns.value)
+        self.view.actionCache_Parsed_Data.setChecked(self.model.is_data_cache_enabled.value)
+        self.view.actionCommon_Grid.setChecked(self.model.is_common_grid.value)
+        self.view.actionSingle_Precision.setChecked(self.model.is_single_precision.value)
         self.view.axesColorColorButton.setColor(self.model.axes_color.value)
         self.view.axesLabelsColorColorButton.setColor(self.model.axes_labels_color.value)
         self.view.backgroundColorColorButton.setColor(self.model.background_color.value)
+        self.view.broadeningProfileComboBox.addItems(self.model.broadening_profiles)
+        self.view.broadeningProfileComboBox.setCurrentText(self.model.broadening_profile.value)
+        self.view.broadeningFwhmDoubleSpinBox.setValue(self.model.broadening_fwhm.value)
+        self._show_broadening_options(self.model.broadening_profile.value)
         self.view.dpiSpinBox.setValue(self.model.dpi.value)
         self.view.figureXDoubleSpinBox.setValue(self.model.figure_x.value)
         self.view.figureYDoubleSpinBox.setValue(self.model.figure_y.value)
+        self.view.gridModeComboBox.addItems(self.model.grid_modes)
+        self.view.gridModeComboBox.setCurrentText(self.model.grid_mode.value)
+        self.view.gridPointsSpinBox.setValue(self.model.grid_points.value)
+        self.view.gridStepDoubleSpinBox.setValue(self.model.grid_step.value)
+        self._show_grid_options(self.model.grid_mode.value)
         self.view.isShowIntermediateLinesCheckBox.setChecked(self.model.is_show_intermediate_lines.value)
         self.view.isTransparentBackgroundCheckBox.setChecked(self.model.is_transparent_background.value)
-        self.view.linesConfigurationTableView.setModel(LinesTableModel(self.model.lines_presets[self.model.lines_preset.value]))
+        self.view.isWatchEnabledCheckBox.setChecked(self.model.is_watch_enabled.value)
         self.view.linesPresetComboBox.addItems(list(self.model.lines_presets.keys()))
         self.view.linesPresetComboBox.setCurrentIndex(list(self.model.lines_presets.keys()).index(self.model.lines_preset.value))
+        self._show_lines_preset(self.model.lines_preset.value)
+        self.view.plotColumnComboBox.addItems(self.model.data_columns)
+        self.view.plotColumnComboBox.setCurrentText(self.model.plot_column.value)
+        self.view.plotColumnComboBox.setEnabled(self.model.is_all_columns.value)
         self.view.plotPlotWidget.setAxesColor(self.model.axes_color.value)
         self.view.plotPlotWidget.setAxesLabelsColor(self.model.axes_labels_color.value)
         self.view.plotPlotWidget.setBackgroundColor(self.model.background_color.value)
-        self.view.plotPlotWidget.setDpi(self.model.dpi.value)
         self.view.plotPlotWidget.setFigureX(self.model.figure_x.value)
         self.view.plotPlotWidget.setFigureY(self.model.figure_y.value)
         self.view.plotPlotWidget.setIsShowIntermediateLines(self.model.is_show_intermediate_lines.value)
         self.view.plotPlotWidget.setIsBackgroundTransparent(self.model.is_transparent_background.value)
+        self.view.plotPlotWidget.setPlotColumn(self.model.plot_column.value)
         self.view.plotPlotWidget.setTicksColor(self.model.ticks_color.value)
         self.view.plotPlotWidget.setTitle(self.model.title.value)
         self.view.plotPlotWidget.setTitleColor(self.model.title_color.value)
@@ -227,4 +333,87 @@ class MainWindowPresenter:
         self.view.xMinDoubleSpinBox.setValue(self.model.x_min.value)
         self.view.yAxisNameLineEdit.setText(self.model.y_axis_name.value)
         self.view.yMaxDoubleSpinBox.setValue(self.model.y_max.value)
-        self.view.yMinDoubleSpinBox.setValue(self.model.y_min.value)
\ No newline at end of file
+        self.view.yMinDoubleSpinBox.setValue(self.model.y_min.value)
+
+
+    def _set_watch_timer_active(self, is_active):
+        if is_active:
+            self._watch_timer.start()
+        else:
+            self._watch_timer.stop()
+
+
+    def _show_broadening_options(self, profile):
+        self.view.broadeningFwhmDoubleSpinBox.setVisible(profile != "None")
+
+
+    def _show_error(self, error):
+        if isinstance(error, ExportError):
+            QErrorMessage(self.view).showMessage(str(error))
+        elif isinstance(error, FileNotFoundError) and error.args:
+            QErrorMessage(self.view).showMessage(
+                f"File {error} does not exist.")
+        elif isinstance(error, FileFormatError):
+            QErrorMessage(self.view).showMessage(
+                f"File {self.model.input_file.value} has an incompatible format. "
+                f"{error}")
+        elif isinstance(error, ValueError) and error.args:
+            QErrorMessage(self.view).showMessage(str(error))
+        else:
+            # Any failure of a runner task (e.g. MemoryError, LinAlgError).
+            message = type(error).__name__
+            if str(error):
+                message += f": {error}"
+            QErrorMessage(self.view).showMessage(message)
+
+
+    def _show_export_progress(self, export_progress):
+        done, total = export_progress
+        self.view.exportProgressBar.setMaximum(total)
+        self.view.exportProgressBar.setValue(done)
+        self.view.exportProgressBar.setVisible(done < total)
+
+
+    def _show_fit_result(self, fit_result):
+        name, rms = fit_result
+        if self.view.linesPresetComboBox.findText(name) < 0:
+            self.view.linesPresetComboBox.addItem(name)
+        self.view.linesPresetComboBox.setCurrentText(self.model.lines_preset.value)
+        QMessageBox.information(self.view, "Fit Preset",
+            f"Fitted parameters are saved as preset \"{name}\".\n"
+            f"RMS of residuals: {rms:.6g}")
+
+
+    def _show_grid_options(self, grid_mode):
+        self.view.gridPointsSpinBox.setVisible(grid_mode == "Uniform Points")
+        self.view.gridStepDoubleSpinBox.setVisible(grid_mode == "Uniform Step")
+
+
+    def _show_lines_preset(self, lines_preset):
+        preset = self.model.lines_presets[lines_preset]
+        if self.view.linesPresetComboBox.findText(lines_preset) < 0:
+            # Presets created by the model (fitted or edited built-in ones).
+            self.view.linesPresetComboBox.addItem(lines_preset)
+            self.view.linesPresetComboBox.setCurrentText(lines_preset)
+        table_view = self.view.linesConfigurationTableView
+        old_model = table_view.model()
+        lines_table_model = LinesTableModel(preset, table_view)
+        lines_table_model.valueEdited.connect(self.model.edit_preset)
+        table_view.setModel(lines_table_model)
+        if old_model:
+            # The old model can be in the middle of `setData` (an edit of a
+            # built-in preset switches to its copy).
+            old_model.deleteLater()
+        set_value_silently(self.view.multiplierDoubleSpinBox, preset["multiplier"])
+
+
+    def _show_warning(self, warning):
+        if warning:
+            QErrorMessage(self.view).showMessage(warning)
+
+
+def set_value_silently(widget, value):
+    # Values rounded by the widget must not be written back to the model.
+    widget.blockSignals(True)
+    widget.setValue(value)
+    widget.blockSignals(False)
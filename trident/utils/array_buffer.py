@@ -0,0 +1,44 @@
+"""
+ArrayBuffer is a helper class for NumPy arrays that grow along the last axis
+(e.g. data of files that are being appended to by a running simulation).
+Appending is amortized O(appended size): storage capacity is doubled when it
+is exhausted, instead of reallocating the whole array on every append.
+Development notes:
+    `values` is a view of the storage. Appending never changes values that are
+    already in the buffer, but `truncate` followed by `append` overwrites them,
+    so views taken before truncation must not be used afterwards.
+
+Author: Artem Shepelin
+License: GPLv3
+"""
+
+import numpy as np
+
+
+class ArrayBuffer:
+    def __init__(self, values):
+        values = np.asarray(values)
+        self._storage = np.array(values, copy=True)
+        self._size = values.shape[-1]
+
+
+    def append(self, values):
+        values = np.asarray(values, dtype=self._storage.dtype)
+        size = self._size + values.shape[-1]
+        if size > self._storage.shape[-1]:
+            capacity = max(size, 2 * self._storage.shape[-1], 1024)
+            storage = np.empty((*self._storage.shape[:-1], capacity),
+                               dtype=self._storage.dtype)
+            storage[..., :self._size] = self._storage[..., :self._size]
+            self._storage = storage
+        self._storage[..., self._size:size] = values
+        self._size = size
+
+
+    def truncate(self, size):
+        self._size = min(size, self._size)
+
+
+    @property
+    def values(self):
+        return self._storage[..., :self._size]
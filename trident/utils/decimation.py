@@ -0,0 +1,72 @@
+"""
+Decimation is a module with level-of-detail reduction of line data for
+plotting. Rendering millions of vertices into a canvas that is only several
+hundred pixels wide is wasteful, so only the visible window is kept and it is
+reduced to minimum and maximum points of each bucket (a bucket is roughly one
+pixel column), which keeps peaks visually exact.
+Development notes:
+    X values are expected to be sorted in ascending order.
+    Buckets contain equal numbers of points. NaN values (gaps in lines) are
+    preserved.
+    `stride_decimate` is a cheaper preview level: it keeps every n-th point of
+    the window (cost doesn't depend on the window size), but peaks between
+    kept points are lost.
+
+Author: Artem Shepelin
+License: GPLv3
+"""
+
+import numpy as np
+
+
+def min_max_decimate(x, y, x_min, x_max, n_buckets):
+    x, y = _window(x, y, x_min, x_max)
+
+    n_buckets = max(int(n_buckets), 1)
+    if x.size <= 4 * n_buckets:
+        return x, y
+
+    bucket_size = -(-x.size // n_buckets)
+    n_full = x.size // bucket_size
+    buckets = y[:n_full * bucket_size].reshape(n_full, bucket_size)
+    tail = y[n_full * bucket_size:]
+
+    nan = np.isnan(buckets)
+    if nan.any():
+        low = np.where(nan, np.inf, buckets).argmin(axis=1)
+        high = np.where(nan, -np.inf, buckets).argmax(axis=1)
+    else:
+        low = buckets.argmin(axis=1)
+        high = buckets.argmax(axis=1)
+    offsets = np.arange(n_full) * bucket_size
+
+    indices = [low + offsets, high + offsets, [0, x.size - 1]]
+    if tail.size and not np.isnan(tail).all():
+        indices.append([n_full * bucket_size + np.nanargmin(tail),
+                        n_full * bucket_size + np.nanargmax(tail)])
+    indices = np.unique(np.concatenate(indices))
+    return x[indices], y[indices]
+
+
+def stride_decimate(x, y, x_min, x_max, n_points):
+    x, y = _window(x, y, x_min, x_max)
+    n_points = max(int(n_points), 2)
+    if x.size <= n_points:
+        return x, y
+    indices = np.linspace(0, x.size - 1, n_points).astype(np.intp)
+    return x[indices], y[indices]
+
+
+def _window(x, y, x_min, x_max):
+    x = np.asarray(x)
+    y = np.asarray(y)
+
+    # Keep one point outside of each side of the window, so lines reach
+    # the edges of the axes.
+    start = 0
+    if x_min is not None:
+        start = max(int(np.searchsorted(x, x_min, side="left")) - 1, 0)
+    stop = x.size
+    if x_max is not None:
+        stop = min(int(np.searchsorted(x, x_max, side="right")) + 1, x.size)
+    return x[start:stop], y[start:stop]
@@ -0,0 +1,59 @@
+"""
+ExportQueue is a helper class for writing exports on a worker thread pool, so
+high-DPI figures and large CSV files don't freeze the GUI. Several exports
+(e.g. PNG, SVG and CSV of the same result) run at the same time.
+Development notes:
+    `progressChanged(done, total)` is emitted on the thread the queue lives in
+    (GUI thread) when an export is queued or completed. Counters are reset
+    when all queued exports are completed.
+
+Author: Artem Shepelin
+License: GPLv3
+"""
+
+import concurrent.futures
+
+from PyQt6.QtCore import pyqtSignal as Signal
+from PyQt6.QtCore import QObject
+
+
+class ExportQueue(QObject):
+    failed = Signal(str, object)
+    finished = Signal(str)
+    progressChanged = Signal(int, int)
+    _done = Signal(object)
+
+
+    def __init__(self, max_workers=None):
+        super().__init__()
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers)
+        self._done_count = 0
+        self._total_count = 0
+
+        self._done.connect(self._on_done)
+
+
+    def submit(self, file_path, function):
+        self._total_count += 1
+        self.progressChanged.emit(self._done_count, self._total_count)
+
+        future = self._executor.submit(function)
+        future.add_done_callback(
+            lambda future: self._done.emit((file_path, future)))
+
+
+    def _on_done(self, task):
+        file_path, future = task
+
+        self._done_count += 1
+        error = future.exception()
+        if error:
+            self.failed.emit(file_path, error)
+        else:
+            self.finished.emit(file_path)
+
+        self.progressChanged.emit(self._done_count, self._total_count)
+        if self._done_count == self._total_count:
+            self._done_count = 0
+            self._total_count = 0
@@ -1,14 +1,27 @@
 """
 Property is a helper class for data binding ability, very useful for Model data.
+Development notes:
+    `changed` signal is emitted only if a new value isn't equal to the current
+    one (values that can't be compared to a single boolean, like DataFrames or
+    arrays, are compared by identity).
+    Changes made inside `with Property.batch():` block are coalesced: each
+    changed property emits `changed` once (with its last value) when the
+    outermost block exits.
 
 Author: Artem Shepelin
 License: GPLv3
 """
 
+import contextlib
+
 from PyQt6.QtCore import pyqtSignal as Signal
 from PyQt6.QtCore import QObject
 
 
+_batch_depth = 0
+_batch_pending = {}
+
+
 class Property(QObject):
     changed = Signal(object)
 
@@ -19,11 +32,41 @@ class Property(QObject):
         self._value = value
 
 
+    @staticmethod
+    @contextlib.contextmanager
+    def batch():
+        global _batch_depth
+        _batch_depth += 1
+        try:
+            yield
+        finally:
+            _batch_depth -= 1
+            if _batch_depth == 0:
+                pending = list(_batch_pending)
+                _batch_pending.clear()
+                for prop in pending:
+                    prop.changed.emit(prop._value)
+
+
     @property
     def value(self):
         return self._value
 
 
     def setValue(self, value):
+        if _is_equal(self._value, value):
+            return
         self._value = value
-        self.changed.emit(value)
\ No newline at end of file
+        if _batch_depth:
+            _batch_pending[self] = None
+        else:
+            self.changed.emit(value)
+
+
+def _is_equal(a, b):
+    if a is b:
+        return True
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        return False
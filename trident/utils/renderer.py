@@ -0,0 +1,100 @@
+"""
+Renderer is a module for offscreen (Agg) rendering of the model state into a
+Matplotlib figure. It mirrors `PlotWidget` styling, but doesn't require Qt
+widgets or a display server, so it can be used for headless batch processing
+and on worker threads.
+Development notes:
+    State is a dictionary of model property values (see `Model.snapshot`).
+    Every point of the data is rendered (no decimation).
+    Overlays are rendered as thin total lines after the lines of the data.
+    `render_sweep` renders totals of a parameter sweep as a heat map
+    (variants x grid), variants are labeled with values of the swept
+    parameters.
+
+Author: Artem Shepelin
+License: GPLv3
+"""
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+from matplotlib.figure import Figure
+import numpy as np
+
+
+COLORS = ["#0EA5FF", "#FF3D00", "#00FF7D", "#FF8C00"]
+
+
+def render_figure(state):
+    figure = Figure(figsize=(state["figure_x"], state["figure_y"]),
+                    dpi=state["dpi"])
+    FigureCanvas(figure)
+    ax = figure.add_subplot(1, 1, 1)
+
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+        if state["axes_color"]:
+            spine.set_color(state["axes_color"])
+
+    if state["axes_labels_color"]:
+        ax.xaxis.label.set_color(state["axes_labels_color"])
+        ax.yaxis.label.set_color(state["axes_labels_color"])
+
+    figure.patch.set_facecolor(state["background_color"])
+    if state["is_transparent_background"]:
+        ax.patch.set_alpha(0)
+    else:
+        figure.patch.set_alpha(1)
+        ax.patch.set_facecolor(state["background_color"])
+        ax.patch.set_alpha(1)
+
+    lines = []
+    data = state["data"]
+    if data is not None:
+        lines = data.lines(state["is_show_intermediate_lines"],
+                           state["plot_column"])
+    n_main = len(lines)
+    lines += [overlay.lines(column=state["plot_column"])[0]
+              for overlay in state["overlays"]]
+    for i, (x, y) in enumerate(lines):
+        ax.plot(x, y, color=COLORS[i % len(COLORS)],
+                linewidth=2 if i < n_main else 1)
+
+    if state["ticks_color"]:
+        ax.tick_params(axis="x", colors=state["ticks_color"])
+        ax.tick_params(axis="y", colors=state["ticks_color"])
+
+    ax.set_title(state["title"], fontsize=14)
+    if state["title_color"]:
+        ax.title.set_color(state["title_color"])
+    ax.set_xlabel(state["x_axis_name"], fontsize=14)
+    ax.set_ylabel(state["y_axis_name"], fontsize=14)
+    ax.set_xlim([state["x_min"], state["x_max"]])
+    ax.set_ylim([state["y_min"], state["y_max"]])
+
+    return figure
+
+
+def render_sweep(grid, totals, axes, title="", dpi=100):
+    totals = totals.reshape(-1, grid.size)
+    figure = Figure(figsize=(8, max(4, min(len(totals) * 0.02 + 2, 20))),
+                    dpi=dpi)
+    FigureCanvas(figure)
+    ax = figure.add_subplot(1, 1, 1)
+
+    image = ax.imshow(totals, aspect="auto", interpolation="nearest",
+                      origin="lower", cmap="magma",
+                      extent=[grid[0], grid[-1], -0.5, len(totals) - 0.5])
+    figure.colorbar(image, ax=ax, label="F")
+
+    if len(axes) == 1:
+        name, values = axes[0]
+        ax.set_ylabel(name)
+        ticks = np.arange(0, len(values), max(-(-len(values) // 10), 1))
+        ax.set_yticks(ticks)
+        ax.set_yticklabels([f"{values[i]:.6g}" for i in ticks])
+    else:
+        names = ", ".join(name for name, values in axes)
+        ax.set_ylabel(f"Variant ({names}, last varies fastest)"
+                      if names else "Variant")
+    ax.set_xlabel("X")
+    ax.set_title(title)
+    return figure
@@ -0,0 +1,81 @@
+"""
+TaskRunner is a helper class for running long operations (loading and
+transformation of data) on a worker thread pool, so the GUI stays responsive.
+Results are delivered back to the thread the runner lives in (GUI thread) with
+Qt's queued signals.
+Development notes:
+    Tasks are submitted to named channels. A newer task in the same channel
+    supersedes the older one: queued task is cancelled, running task result is
+    discarded when it finishes.
+    `busyChanged` signal is emitted when the runner starts or stops having
+    pending tasks.
+
+Author: Artem Shepelin
+License: GPLv3
+"""
+
+import concurrent.futures
+
+from PyQt6.QtCore import pyqtSignal as Signal
+from PyQt6.QtCore import QObject
+
+
+class TaskRunner(QObject):
+    busyChanged = Signal(bool)
+    _done = Signal(object)
+
+
+    def __init__(self, max_workers=None):
+        super().__init__()
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers)
+        self._generations = {}
+        self._futures = {}
+        self._pending = 0
+
+        self._done.connect(self._on_done)
+
+
+    def cancel(self, channel):
+        self._generations[channel] = self._generations.get(channel, 0) + 1
+        future = self._futures.pop(channel, None)
+        if future:
+            future.cancel()
+
+
+    @property
+    def is_busy(self):
+        return self._pending > 0
+
+
+    def submit(self, channel, function, on_finished, on_failed=None):
+        self.cancel(channel)
+        generation = self._generations[channel]
+
+        self._pending += 1
+        if self._pending == 1:
+            self.busyChanged.emit(True)
+
+        future = self._executor.submit(function)
+        self._futures[channel] = future
+        future.add_done_callback(
+            lambda future: self._done.emit(
+                (channel, generation, future, on_finished, on_failed)))
+
+
+    def _on_done(self, task):
+        channel, generation, future, on_finished, on_failed = task
+
+        self._pending -= 1
+        if self._pending == 0:
+            self.busyChanged.emit(False)
+
+        if future.cancelled() or self._generations.get(channel) != generation:
+            return
+        del self._futures[channel]
+        error = future.exception()
+        if error:
+            if on_failed:
+                on_failed(error)
+        else:
+            on_finished(future.result())